@@ -0,0 +1,156 @@
+"""Replay recorded sessions and compare prompt tokens, steps and node timings.
+
+Record cassettes with `hi --record session.json ...`, then:
+
+- run: replay cassettes against the working tree and write a report.
+- compare: diff two reports, e.g. of the base branch and of a change.
+- revisions: replay cassettes against two git revisions (both must include the
+  replay support) and diff them.
+
+Usage:
+    python benchmarks/replay.py run cassettes/*.json [-o report.json] [--repeat 3]
+    python benchmarks/replay.py compare base.json head.json
+    python benchmarks/replay.py revisions main HEAD cassettes/*.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+async def run(
+    paths: list[str], repeat: int, config_path: str | None
+) -> dict[str, dict[str, Any]]:
+    """Replay every cassette and return the reports, keyed by cassette name."""
+    from hi.graph.cassette import load_cassette, replay
+    from hi.graph.configuration import Configuration, load_config
+
+    config_obj = load_config(config_path) if config_path else Configuration()
+    reports = {}
+    for path in paths:
+        cassette = load_cassette(path)
+        runs = [await replay(cassette, config_obj) for _ in range(repeat)]
+        # Tokens and steps are deterministic, timings are medians
+        report = runs[0]
+        report["node_seconds"] = {
+            node: statistics.median(r["node_seconds"].get(node, 0) for r in runs)
+            for node in report["node_seconds"]
+        }
+        report["wall_seconds"] = statistics.median(r["wall_seconds"] for r in runs)
+        reports[Path(path).name] = report
+    return reports
+
+
+def _delta(base: float, head: float, unit: str = "") -> str:
+    change = f" ({(head - base) / base:+.1%})" if base else ""
+    return f"{base:g}{unit} -> {head:g}{unit}{change}"
+
+
+def compare(base: dict[str, Any], head: dict[str, Any]) -> str:
+    """Format the differences between two reports."""
+    lines = []
+    totals = {"base": 0, "head": 0}
+    for name in sorted(base.keys() & head.keys()):
+        b, h = base[name], head[name]
+        totals["base"] += b["prompt_tokens"]
+        totals["head"] += h["prompt_tokens"]
+        lines.append(name)
+        lines.append(f"  steps          {_delta(b['steps'], h['steps'])}")
+        lines.append(
+            f"  prompt tokens  {_delta(b['prompt_tokens'], h['prompt_tokens'])}"
+        )
+        for node in sorted(b["node_seconds"].keys() | h["node_seconds"].keys()):
+            base_ms = round(b["node_seconds"].get(node, 0) * 1000, 2)
+            head_ms = round(h["node_seconds"].get(node, 0) * 1000, 2)
+            lines.append(f"  {node:<14} {_delta(base_ms, head_ms, ' ms')}")
+        if h["unused_responses"] or h["steps"] > b["steps"]:
+            lines.append("  warning: the replay diverged from the recording")
+    for name in sorted(base.keys() ^ head.keys()):
+        lines.append(f"{name}: only in {'base' if name in base else 'head'}")
+    lines.append(f"total prompt tokens {_delta(totals['base'], totals['head'])}")
+    return "\n".join(lines)
+
+
+def revisions(base: str, head: str, paths: list[str], repeat: int) -> str:
+    """Replay cassettes against two git revisions and compare them."""
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for revision in (base, head):
+            worktree = Path(tmp) / revision.replace("/", "_")
+            subprocess.run(
+                ["git", "worktree", "add", "--detach", str(worktree), revision],
+                cwd=REPO,
+                check=True,
+                capture_output=True,
+            )
+            try:
+                output = Path(tmp) / f"{worktree.name}.json"
+                subprocess.run(
+                    [sys.executable, __file__, "run", *paths]
+                    + ["--repeat", str(repeat), "-o", str(output)],
+                    env={**os.environ, "PYTHONPATH": str(worktree / "src")},
+                    check=True,
+                )
+                reports.append(json.loads(output.read_text()))
+            finally:
+                subprocess.run(
+                    ["git", "worktree", "remove", "--force", str(worktree)],
+                    cwd=REPO,
+                    check=True,
+                )
+    return compare(*reports)
+
+
+def main() -> None:
+    """Parse the command line and run the subcommand."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("cassettes", nargs="+")
+    run_parser.add_argument("-o", "--output")
+    run_parser.add_argument("-c", "--config", help="Configuration file to replay with.")
+    run_parser.add_argument("--repeat", type=int, default=3)
+
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+
+    revisions_parser = subparsers.add_parser("revisions")
+    revisions_parser.add_argument("base")
+    revisions_parser.add_argument("head")
+    revisions_parser.add_argument("cassettes", nargs="+")
+    revisions_parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        cassettes = [str(Path(path).resolve()) for path in args.cassettes]
+        reports = asyncio.run(run(cassettes, args.repeat, args.config))
+        if args.output:
+            Path(args.output).write_text(json.dumps(reports, indent=2))
+        for name, report in reports.items():
+            print(
+                f"{name}: {report['steps']} steps, "
+                f"{report['prompt_tokens']} prompt tokens, "
+                f"{report['wall_seconds'] * 1000:.1f} ms"
+            )
+    elif args.command == "compare":
+        base = json.loads(Path(args.base).read_text())
+        head = json.loads(Path(args.head).read_text())
+        print(compare(base, head))
+    else:
+        cassettes = [str(Path(path).resolve()) for path in args.cassettes]
+        print(revisions(args.base, args.head, cassettes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare the prompt tokens of each serialization format on recorded sessions.
+
+Record cassettes with `hi --record session.json ...`, then replay them with each
+format. For every cassette, the report shows the tokens of the tool results and
+of the pane content block as serialized once, and the prompt tokens summed over
+all model calls of the replay, which is what the session would have cost.
+
+Usage:
+    python benchmarks/serialization.py cassettes/*.json [-c config.yaml]
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+from typing import Any, get_args
+
+
+async def measure(path: str, config_path: str | None) -> dict[str, dict[str, int]]:
+    """Return the token counts of a cassette, keyed by format."""
+    from langchain_core.messages import ToolMessage
+
+    from hi.context.stdin import STDIN_PANE_ID
+    from hi.graph.cassette import count_tokens, load_cassette, replay
+    from hi.graph.configuration import Configuration, load_config
+    from hi.graph.serialization import Serialization, format_panes, format_tool_content
+
+    config_obj = load_config(config_path) if config_path else Configuration()
+    cassette = load_cassette(path)
+    panes = {
+        pane_id: "\n".join(lines) for pane_id, lines in cassette.window_content.items()
+    }
+
+    results = {}
+    # The previous format first, as the baseline
+    for serialization in sorted(get_args(Serialization), key=lambda s: s != "verbose"):
+        tool_tokens = sum(
+            count_tokens(str(format_tool_content(message.content, serialization)))
+            for message in cassette.messages
+            if isinstance(message, ToolMessage)
+        )
+        context_tokens = count_tokens(
+            format_panes(
+                panes,
+                cassette.current_pane_id,
+                serialization,
+                stdin=cassette.current_pane_id == STDIN_PANE_ID,
+            )
+        )
+        report = await replay(
+            cassette, config_obj.model_copy(update={"serialization": serialization})
+        )
+        results[serialization] = {
+            "tool_results": tool_tokens,
+            "context": context_tokens,
+            "prompt": report["prompt_tokens"],
+        }
+    return results
+
+
+def format_results(name: str, results: dict[str, dict[str, int]]) -> str:
+    """Format the token counts of a cassette, relative to the first format."""
+    base_name, base = next(iter(results.items()))
+    lines = [name]
+    for serialization, counts in results.items():
+        cells = []
+        for key, value in counts.items():
+            change = ""
+            if serialization != base_name and base[key]:
+                change = f" ({(value - base[key]) / base[key]:+.1%})"
+            cells.append(f"{key} {value}{change}")
+        lines.append(f"  {serialization:<8} " + ", ".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the measurement."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cassettes", nargs="+")
+    parser.add_argument("-c", "--config", help="Configuration to replay with.")
+    args = parser.parse_args(argv)
+
+    totals: dict[str, dict[str, Any]] = {}
+    for path in args.cassettes:
+        results = asyncio.run(measure(path, args.config))
+        print(format_results(Path(path).name, results))
+        for serialization, counts in results.items():
+            total = totals.setdefault(serialization, dict.fromkeys(counts, 0))
+            for key, value in counts.items():
+                total[key] += value
+    if len(args.cassettes) > 1:
+        print(format_results("total", totals))
+
+
+if __name__ == "__main__":
+    main()
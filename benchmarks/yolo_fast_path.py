@@ -0,0 +1,121 @@
+"""Benchmark the per-step overhead of confirmation interrupts.
+
+Runs the same multi-step tool loop against a scripted model twice:
+
+- interrupt: every tool call interrupts the graph and is resumed with
+  `Command(resume="continue")` in a new stream, as `hi -y` used to do.
+- fast path: `auto_approve` approves inside `human_feedback`, and the whole loop
+  runs as one stream checkpointed at its end.
+
+Usage:
+    python benchmarks/yolo_fast_path.py [--steps 50] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import Command
+
+from hi.graph.configuration import CommandPolicy, Configuration
+from hi.graph.graph import build_graph
+
+
+class ScriptedToolModel(BaseChatModel):
+    """Call `true` until the conversation has `steps` tool results, then answer."""
+
+    steps: int
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-tool-model"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedToolModel":
+        return self
+
+    def _generate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        done = sum(message.type == "tool" for message in messages)
+        if done >= self.steps:
+            message = AIMessage(content="done")
+        else:
+            message = AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": "execute_command",
+                        "args": {"command": "true", "explanation": "benchmark"},
+                        "id": f"call_{done}",
+                    }
+                ],
+            )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+async def run_turn(
+    graph: CompiledStateGraph[Any, Any, Any, Any], steps: int, fast_path: bool
+) -> float:
+    """Run one turn of `steps` tool calls and return its wall time in seconds."""
+    # `true` is read-only, so disable the policy to keep interrupting without -y
+    configuration = Configuration(
+        auto_approve=fast_path,
+        command_policy=CommandPolicy(auto_approve_read_only=False),
+    )
+    configurable = configuration.model_dump(exclude_none=True)
+    config = {
+        "configurable": {"thread_id": uuid.uuid4(), **configurable},
+        "recursion_limit": 4 * steps + 10,
+    }
+    graph_input: dict | Command = {"messages": "benchmark"}
+
+    start = time.perf_counter()
+    while True:
+        interrupted = False
+        async for event in graph.astream(
+            graph_input,
+            config=config,
+            stream_mode="updates",
+            durability="exit" if fast_path else "async",
+        ):
+            if "__interrupt__" in event:
+                interrupted = True
+        if not interrupted:
+            break
+        graph_input = Command(resume="continue")
+    return time.perf_counter() - start
+
+
+async def main(steps: int, repeat: int) -> None:
+    """Run the benchmark and print the per-step overhead."""
+    model = ScriptedToolModel(steps=steps)
+    graph = build_graph(checkpointer=InMemorySaver(), model_factory=lambda _: model)
+
+    results = {}
+    for name, fast_path in (("interrupt", False), ("fast path", True)):
+        await run_turn(graph, steps, fast_path)  # warm up
+        times = [await run_turn(graph, steps, fast_path) for _ in range(repeat)]
+        results[name] = statistics.median(times)
+        print(
+            f"{name:<10} {results[name] * 1000:8.1f} ms/turn "
+            f"{results[name] / steps * 1000:6.2f} ms/step"
+        )
+
+    saved = (results["interrupt"] - results["fast path"]) / steps
+    print(f"overhead removed: {saved * 1000:.2f} ms/step")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.steps, args.repeat))
@@ -0,0 +1,175 @@
+"""Concurrent, non-interactive batch mode.
+
+Each line of the batch file is an independent prompt that runs in its own graph
+thread. Threads run concurrently on the event loop and share the model client
+(and its rate limiter). Tool calls are approved or denied according to a fixed
+policy, and results are written as JSON lines as soon as they finish.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import IO, Any, Literal
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.types import Command
+
+from hi.graph.configuration import Configuration
+from hi.graph.graph import graph
+from hi.graph.ratelimit import request_priority
+from hi.graph.store import BLOB_STORE, store_window_content
+from hi.graph.tools import pending_comm_tasks
+from hi.graph.utils import get_message_text
+
+BATCH_PANE_ID = "batch"
+
+ApprovalPolicy = Literal["approve", "deny"]
+
+DENIED_FEEDBACK = (
+    "Running commands is not allowed in this non-interactive session. "
+    "Answer with the information you already have."
+)
+
+
+def read_batch(path: str | Path) -> list[dict[str, Any]]:
+    """Read batch items from a JSON lines file.
+
+    Each line is either a JSON string (the prompt) or an object with a `prompt`
+    key and optional `id`, `context` (text) and `context_file` (path) keys.
+    """
+    items = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"prompt": item}
+            if "prompt" not in item:
+                raise ValueError(f"{path}:{line_no}: missing 'prompt'")
+            item.setdefault("id", line_no)
+            items.append(item)
+    return items
+
+
+def _item_context(item: dict[str, Any]) -> list[str]:
+    """Return the context lines of a batch item."""
+    if context_file := item.get("context_file"):
+        return Path(context_file).read_text(errors="replace").splitlines()
+    return str(item.get("context", "")).splitlines()
+
+
+async def _cancel_pending_commands(graph_config: RunnableConfig) -> None:
+    """Kill the commands of a thread that are still running in the background."""
+    state = await graph.aget_state(graph_config)
+    for message in state.values.get("messages", []):
+        if isinstance(message, ToolMessage):
+            if task := pending_comm_tasks.pop(message.tool_call_id, None):
+                task.cancel()
+
+
+async def run_item(
+    item: dict[str, Any],
+    config_obj: Configuration,
+    approve: ApprovalPolicy,
+    callbacks: list[BaseCallbackHandler] | None = None,
+) -> dict[str, Any]:
+    """Run a single batch item to completion and return its result record."""
+    thread_id = uuid.uuid4()
+    auto_approve = approve == "approve"
+    configurable = config_obj.model_dump(exclude_none=True)
+    configurable["auto_approve"] = auto_approve
+    if not auto_approve:
+        # Read-only commands would otherwise run without confirmation
+        configurable["command_policy"]["auto_approve_read_only"] = False
+    graph_config = RunnableConfig(
+        configurable={"thread_id": thread_id, **configurable}, callbacks=callbacks
+    )
+    result: dict[str, Any] = {"id": item["id"], "prompt": item["prompt"]}
+    start = time.perf_counter()
+
+    graph_input: dict[str, Any] | Command[Any] = {
+        "messages": item["prompt"],
+        "window_content": store_window_content(
+            {BATCH_PANE_ID: _item_context(item)}, str(thread_id)
+        ),
+        "current_pane_id": BATCH_PANE_ID,
+    }
+    try:
+        while True:
+            interrupt_data = None
+            async for event in graph.astream(
+                graph_input,
+                config=graph_config,
+                stream_mode="updates",
+                durability="exit" if auto_approve else "async",
+            ):
+                if "__interrupt__" in event:
+                    interrupt_data = event["__interrupt__"][0].value
+
+            if interrupt_data is None:
+                break
+            graph_input = Command(resume=DENIED_FEEDBACK)
+
+        state = await graph.aget_state(graph_config)
+        messages = state.values["messages"]
+        result["response"] = get_message_text(messages[-1])
+        result["usage"] = state.values.get("usage", {})
+        # Read-only tools run in both modes, only denied calls get the feedback
+        ran = {
+            message.tool_call_id
+            for message in messages
+            if isinstance(message, ToolMessage) and message.content != DENIED_FEEDBACK
+        }
+        result["tool_calls"] = [
+            {**tool_call["args"], "approved": tool_call["id"] in ran}
+            for message in messages
+            if isinstance(message, AIMessage)
+            for tool_call in message.tool_calls
+        ]
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        await _cancel_pending_commands(graph_config)
+        if isinstance(graph.checkpointer, BaseCheckpointSaver):
+            await graph.checkpointer.adelete_thread(str(thread_id))
+        BLOB_STORE.release(str(thread_id))
+
+    result["elapsed"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+async def run_batch(
+    items: list[dict[str, Any]],
+    config_obj: Configuration,
+    output: IO[str],
+    concurrency: int,
+    approve: ApprovalPolicy,
+    callbacks: list[BaseCallbackHandler] | None = None,
+) -> int:
+    """Run batch items concurrently and stream results to `output`.
+
+    Returns:
+        int: The number of items that failed.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    # Interactive sessions sharing the provider key go first
+    request_priority.set("background")
+
+    async def _bounded(item: dict[str, Any]) -> dict[str, Any]:
+        async with semaphore:
+            return await run_item(item, config_obj, approve, callbacks)
+
+    failed = 0
+    for task in asyncio.as_completed([_bounded(item) for item in items]):
+        result = await task
+        failed += "error" in result
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+
+    return failed
@@ -4,25 +4,42 @@ import asyncio
 import json
 import logging
 import os
+import sys
 import uuid
-from typing import cast
+from typing import IO, Any, cast
 
 import asyncclick as click
 import dotenv
-from langchain_core.messages import AIMessageChunk, ToolMessage
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.types import Command
 
-from hi.context.tmux import Tmux
+from hi.cli.batch import DENIED_FEEDBACK, ApprovalPolicy, read_batch, run_batch
+from hi.cli.render import ToolCallRenderer
+from hi.context.stdin import STDIN_PANE_ID, read_stream
+from hi.context.tmux import Tmux, TmuxCommandError
+from hi.graph.cassette import save_cassette
 from hi.graph.configuration import (
     DEFAULT_CONFIG_PATH,
     DEFAULT_ENV_PATH,
     Configuration,
+    ModelConfig,
     load_config,
     setup_config,
 )
+from hi.graph.file_tools import READ_ONLY_TOOLS
 from hi.graph.graph import graph
+from hi.graph.store import BLOB_STORE, resolve_fields, store_window_content
+from hi.graph.usage import (
+    USAGE_KEYS,
+    Usage,
+    format_usage,
+    read_sessions,
+    record_session,
+    summarize,
+)
 from hi.graph.utils import get_message_text
+from hi.graph.warmup import PIN_KEEP_ALIVE, warm_up
 
 dotenv.load_dotenv(DEFAULT_ENV_PATH, override=True)
 
@@ -31,7 +48,7 @@ callbacks = []
 
 
 @click.command()
-@click.argument("prompts", required=True, nargs=-1, type=str)
+@click.argument("prompts", required=False, nargs=-1, type=str)
 @click.option("-f", "--fast", is_flag=True, help="Run fast model.")
 @click.option("-y", "--yolo", is_flag=True, help="Automatically accept all actions.")
 @click.option(
@@ -50,6 +67,51 @@ callbacks = []
     default=DEFAULT_CONFIG_PATH,
     help="Path to the configuration file.",
 )
+@click.option(
+    "--batch",
+    "batch_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Run every prompt of a JSON lines file non-interactively.",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of batch prompts to run concurrently.",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="Where to write batch results as JSON lines.",
+)
+@click.option(
+    "--approve",
+    type=click.Choice(["deny", "approve"]),
+    default="deny",
+    show_default=True,
+    help="Whether batch prompts may run the commands they request. "
+    "File reading tools always run.",
+)
+@click.option(
+    "--record",
+    "record_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Save the session as a cassette, to be replayed by benchmarks/replay.py.",
+)
+@click.option(
+    "--warm",
+    is_flag=True,
+    help="Load the model on its self-hosted server and keep it loaded, then exit.",
+)
+@click.option(
+    "--usage",
+    "show_usage",
+    is_flag=True,
+    help="Show a token and cost report of past sessions and exit.",
+)
 async def main(
     prompts: list[str],
     fast: bool,
@@ -57,19 +119,79 @@ async def main(
     enable_langfuse: bool,
     max_lines: int,
     config_path: str,
+    batch_path: str | None,
+    concurrency: int,
+    output: IO[str],
+    approve: ApprovalPolicy,
+    record_path: str | None,
+    warm: bool,
+    show_usage: bool,
 ) -> None:
     """Start the tmux server and handle commands."""
+    if show_usage:
+        click.echo(summarize(read_sessions()))
+        return
+
+    if warm:
+        config_obj = _load_config(config_path, fast)
+        if config_obj is not None:
+            await _pin_model(config_obj)
+        return
+
+    if not prompts and not batch_path:
+        raise click.UsageError("Missing argument 'PROMPTS...'.")
+
     if enable_langfuse:
         setup_langfuse()
 
+    warm_up_tasks = []
     try:
-        await _main(prompts, fast, yolo, config_path)
+        config_obj = _load_config(config_path, fast)
+        if config_obj is None:
+            return
+        warm_up_tasks = [
+            asyncio.create_task(warm_up(model))
+            for model in (config_obj.smart_model, config_obj.fast_model)
+            if model and model.warm_up
+        ]
+        if batch_path:
+            items = read_batch(batch_path)
+            failed = await run_batch(
+                items, config_obj, output, concurrency, approve, callbacks
+            )
+            click.echo(
+                f"{len(items) - failed}/{len(items)} prompts succeeded.", err=True
+            )
+        else:
+            await _main(prompts, config_obj, yolo, record_path)
     except asyncio.exceptions.CancelledError:
         click.echo(click.style("\nBye~", fg="green"))
+    finally:
+        for task in warm_up_tasks:
+            task.cancel()
+
+
+async def _pin_model(config_obj: Configuration) -> None:
+    """Load the default model and keep it loaded until its server stops."""
+    model = _default_model(config_obj)
+    seconds = await warm_up(model, keep_alive=PIN_KEEP_ALIVE)
+    if seconds is None:
+        raise click.ClickException(
+            f"Could not warm up {model.fully_specified_name}. Only Ollama and "
+            "OpenAI-compatible servers with a base_url can be warmed up."
+        )
+    click.echo(f"{model.fully_specified_name} loaded in {seconds:.1f}s.")
+
 
+def _default_model(config_obj: Configuration) -> ModelConfig:
+    """Return the configuration of the model used at the start of a session."""
+    if config_obj.default_model == "fast" and config_obj.fast_model:
+        return config_obj.fast_model
+    return config_obj.smart_model
 
-async def _main(prompts: list[str], fast: bool, yolo: bool, config_path: str) -> None:
-    """Prepare configuration and initial state, then run the interaction loop."""
+
+def _load_config(config_path: str, fast: bool) -> Configuration | None:
+    """Load the configuration, writing the default one on first run."""
     if setup_config():
         click.echo(f"Default configuration file written to {DEFAULT_CONFIG_PATH}.")
 
@@ -77,71 +199,198 @@ async def _main(prompts: list[str], fast: bool, yolo: bool, config_path: str) ->
     if fast:
         if not config_obj.fast_model:
             click.echo(click.style("Fast model is not configured.", fg="red"), err=True)
-            return
+            return None
         config_obj.default_model = "fast"
 
+    return config_obj
+
+
+async def _main(
+    prompts: list[str],
+    config_obj: Configuration,
+    yolo: bool,
+    record_path: str | None = None,
+) -> None:
+    """Prepare the initial state, then run the interaction loop."""
     prompt = " ".join(prompts)
 
-    tmux = Tmux()
+    interactive = True
+    window_content: dict[str, str | list[str]]
+    if not sys.stdin.isatty():
+        window_content = {
+            STDIN_PANE_ID: await asyncio.to_thread(
+                read_stream, sys.stdin.buffer, config_obj.stdin_max_lines
+            )
+        }
+        current_pane_id = STDIN_PANE_ID
+        interactive = _reattach_tty()
+    else:
+        # Off the event loop, so that model warm-up requests progress meanwhile
+        window_content, current_pane_id = await asyncio.to_thread(
+            _capture_tmux, config_obj
+        )
 
+    thread_id = uuid.uuid4()
     graph_input = {
         "messages": prompt,
-        "window_content": tmux.capture_current_window(),
-        "current_pane_id": tmux.current_pane.id,
+        "window_content": store_window_content(window_content, str(thread_id)),
+        "current_pane_id": current_pane_id,
     }
 
-    await _run_interaction_loop(graph_input, config_obj, yolo)
+    try:
+        await _run_interaction_loop(
+            graph_input, config_obj, yolo, interactive, thread_id, record_path
+        )
+    finally:
+        BLOB_STORE.release(str(thread_id))
+
+
+def _capture_tmux(
+    config_obj: Configuration,
+) -> tuple[dict[str, str | list[str]], str]:
+    """Capture the tmux window content, or nothing when not running inside tmux."""
+    if not os.environ.get("TMUX"):
+        return {}, ""
+
+    tmux = Tmux()
+    try:
+        if config_obj.context_all_windows:
+            window_content = tmux.capture_session()
+        else:
+            window_content = tmux.capture_current_window()
+        return window_content, tmux.current_pane.id or ""
+    except TmuxCommandError as e:
+        logging.warning(f"{e} Continuing without window content.")
+        return {}, ""
+
+
+def _reattach_tty() -> bool:
+    """Read further user input from the terminal once piped stdin is consumed.
+
+    Returns:
+        bool: Whether a terminal is available for interaction.
+    """
+    try:
+        sys.stdin = open("/dev/tty")
+    except OSError:
+        return False
+    return True
 
 
 async def _run_interaction_loop(
-    initial_input: dict, config_obj: Configuration, yolo: bool
+    initial_input: dict,
+    config_obj: Configuration,
+    yolo: bool,
+    interactive: bool = True,
+    thread_id: uuid.UUID | None = None,
+    record_path: str | None = None,
 ):
     """Run the main graph interaction loop."""
-    thread_id = uuid.uuid4()
+    thread_id = thread_id or uuid.uuid4()
+    if yolo:
+        config_obj = config_obj.model_copy(update={"auto_approve": True})
     configurable = config_obj.model_dump(exclude_none=True)
     graph_config = RunnableConfig(
         configurable={"thread_id": thread_id, **configurable}, callbacks=callbacks
     )
 
     graph_input: dict | Command = initial_input
+    turn_start: Usage = {}
+    renderer = ToolCallRenderer(config_obj.command_policy)
 
-    while True:
-        async for event_type, event in graph.astream(
-            graph_input, config=graph_config, stream_mode=["updates", "messages"]
-        ):
-            if event_type == "updates":
-                event = cast(dict, event)
-                resume_command = _handle_update_event(event, yolo)
-                if resume_command:
-                    graph_input = resume_command
-                    break  # resume graph
-            elif event_type == "messages":
-                event = cast(tuple, event)
-                _handle_message_event(event)
-        else:  # Only stop if no tool calls left
-            prompt = click.prompt(
-                CMD_PROMPT,
-                type=str,
-                default="bye",
-                show_default=False,
-                prompt_suffix="",
-            )
-            if prompt.lower() == "bye":
-                click.echo(click.style("Bye~", fg="green"))
-                break  # END
-            else:
-                graph_input = {
-                    "messages": prompt,
+    try:
+        while True:
+            # With auto-approval a turn runs as one stream, checkpointed at its end
+            async for event_type, event in graph.astream(
+                graph_input,
+                config=graph_config,
+                stream_mode=["updates", "messages"],
+                durability="exit" if yolo else "async",
+            ):
+                if event_type == "updates":
+                    event = cast(dict, event)
+                    resume_command = await _handle_update_event(
+                        event, renderer, interactive
+                    )
+                    if resume_command:
+                        graph_input = resume_command
+                        break  # resume graph
+                elif event_type == "messages":
+                    event = cast(tuple, event)
+                    _handle_message_event(event, renderer)
+            else:  # Only stop if no tool calls left
+                if not interactive:
+                    click.echo()
+                    break  # END
+                state = await graph.aget_state(graph_config)
+                session_usage = state.values.get("usage", {})
+                turn_usage = {
+                    key: session_usage.get(key, 0) - turn_start.get(key, 0)
+                    for key in USAGE_KEYS
                 }
+                turn_start = session_usage
+                prompt = click.prompt(
+                    _usage_prompt(turn_usage, session_usage) + CMD_PROMPT,
+                    type=str,
+                    default="bye",
+                    show_default=False,
+                    prompt_suffix="",
+                )
+                if prompt.lower() == "bye":
+                    click.echo(click.style("Bye~", fg="green"))
+                    break  # END
+                else:
+                    graph_input = {
+                        "messages": prompt,
+                    }
+    finally:
+        state = await graph.aget_state(graph_config)
+        record_session(str(thread_id), state.values.get("model_usage", {}))
+        model = _default_model(config_obj)
+        if record_path and state.values.get("messages"):
+            save_cassette(
+                record_path,
+                state.values["messages"],
+                state.values.get("window_content", {}),
+                state.values.get("current_pane_id", ""),
+                model.fully_specified_name,
+            )
+            click.echo(click.style(f"Session recorded to {record_path}.", dim=True))
 
 
-def _handle_update_event(event: dict, yolo: bool) -> Command | None:
+def _usage_prompt(turn_usage: Usage, session_usage: Usage) -> str:
+    """Format the token usage shown above the input prompt."""
+    if not session_usage:
+        return ""
+    return click.style(
+        f"\n[turn {format_usage(turn_usage)} | session {format_usage(session_usage)}]",
+        dim=True,
+    )
+
+
+async def _handle_update_event(
+    event: dict, renderer: ToolCallRenderer, interactive: bool = True
+) -> Command | None:
     """Handle 'updates' from the graph stream."""
     node_name, updates = next(iter(event.items()))
 
     if node_name == "__interrupt__":
         interrupt_data = updates[0].value
-        return _handle_interrupt(interrupt_data, yolo)
+        return await _handle_interrupt(interrupt_data, renderer, interactive)
+
+    if node_name == "call_model":
+        for message in updates["messages"]:
+            if isinstance(message, AIMessage):
+                renderer.finish(message)
+                for tool_call in message.tool_calls:
+                    if tool_call["name"] in READ_ONLY_TOOLS:
+                        arguments = ", ".join(
+                            f"{key}={value!r}"
+                            for key, value in tool_call["args"].items()
+                        )
+                        click.echo(
+                            click.style(f"\n{tool_call['name']}({arguments})", dim=True)
+                        )
 
     if node_name == "tools":
         tool_message = cast(ToolMessage, updates["messages"][-1])
@@ -152,7 +401,27 @@ def _handle_update_event(event: dict, yolo: bool) -> Command | None:
             except json.JSONDecodeError:
                 pass
 
-        if isinstance(content, dict):
+        if tool_message.name in READ_ONLY_TOOLS:
+            # File tool outputs are for the model, only show that they ran
+            output: dict[str, Any] = (
+                resolve_fields(content) if isinstance(content, dict) else {}
+            )
+            text = next(
+                (
+                    output[key]
+                    for key in ("content", "matches", "entries")
+                    if key in output
+                ),
+                "",
+            )
+            summary = (
+                f"error: {output['error']}"
+                if "error" in output
+                else f"{len(text)} chars read"
+            )
+            click.echo(click.style(f"[{tool_message.name}] {summary}", dim=True))
+        elif isinstance(content, dict):
+            content = resolve_fields(content)
             output_parts = []
             if stdout := content.get("stdout", "").strip():
                 output_parts.append(f"stdout:\n{stdout}")
@@ -162,37 +431,69 @@ def _handle_update_event(event: dict, yolo: bool) -> Command | None:
                 output_parts.append(f"error: {error}")
             if "code" in content:
                 output_parts.append(f"code: {content.get('code')}")
+            if usage := content.get("usage"):
+                output_parts.append(_format_command_usage(usage))
             output = "\n---\n".join(output_parts)
-        else:
-            output = content
-
-        if output:
-            click.echo(click.style(output, "yellow"))
+            if output:
+                click.echo(click.style(output, "yellow"))
+        elif content:
+            click.echo(click.style(str(content), "yellow"))
 
     return None
 
 
+def _format_command_usage(usage: dict[str, float]) -> str:
+    """Format the resource usage of an executed command."""
+    parts = [f"wall {usage['wall_seconds']:.2f}s"]
+    if "cpu_seconds" in usage:
+        parts.append(f"cpu {usage['cpu_seconds']:.2f}s")
+    if "max_rss_mb" in usage:
+        parts.append(f"max rss {usage['max_rss_mb']:.1f} MB")
+    return "usage: " + ", ".join(parts)
+
+
 CMD_PROMPT = click.style("\n> ", "blue")
 
 
-def _handle_interrupt(interrupt_data: dict, yolo: bool) -> Command:
+async def _handle_interrupt(
+    interrupt_data: dict,
+    renderer: ToolCallRenderer,
+    interactive: bool = True,
+) -> Command:
     """Handle a user interrupt to confirm a tool call."""
-    tool_call = interrupt_data["tool_call"]
-    command = tool_call["command"]
-    explanation = tool_call["explanation"]
-
-    click.echo(
-        f"-----\n{click.style('Command to execute: `', 'green')}"
-        f"{click.style(command, 'red')}"
-        f"{click.style('`', 'green')}"
-    )
-    click.echo(
-        f"{click.style('Explanation: ', 'green')}"
-        f"{click.style(explanation, 'bright_green')}"
-    )
+    tool_call = dict(interrupt_data["tool_call"])
+    name = interrupt_data.get("name", "execute_command")
+    explanation = tool_call.pop("explanation", "")
+
+    if name == "execute_command":
+        command = tool_call["command"]
+        if not renderer.shown(command):
+            click.echo(
+                f"-----\n{click.style('Command to execute: `', 'green')}"
+                f"{click.style(command, 'red')}"
+                f"{click.style('`', 'green')}"
+            )
+            click.echo(
+                f"{click.style('Explanation: ', 'green')}"
+                f"{click.style(explanation, 'bright_green')}"
+            )
 
-    if yolo:
-        return Command(resume="continue")
+        for warning in await renderer.warnings(command):
+            click.echo(click.style(f"Warning: {warning}", "yellow"))
+    else:
+        arguments = ", ".join(f"{key}={value!r}" for key, value in tool_call.items())
+        click.echo(
+            f"-----\n{click.style('Tool to run: ', 'green')}"
+            f"{click.style(f'{name}({arguments})', 'red')}"
+        )
+        click.echo(
+            f"{click.style('Explanation: ', 'green')}"
+            f"{click.style(explanation, 'bright_green')}"
+        )
+
+    if not interactive:
+        click.echo(click.style("No terminal to confirm the command, skipping.", "red"))
+        return Command(resume=DENIED_FEEDBACK)
 
     feedback = click.prompt(
         click.style(
@@ -208,11 +509,12 @@ def _handle_interrupt(interrupt_data: dict, yolo: bool) -> Command:
     return Command(resume=feedback)
 
 
-def _handle_message_event(event: tuple):
+def _handle_message_event(event: tuple, renderer: ToolCallRenderer):
     """Handle 'messages' from the graph stream (LLM tokens)."""
     chunk, _ = event
     if isinstance(chunk, AIMessageChunk):
         click.echo(get_message_text(chunk), nl=False)
+        renderer.feed(chunk)
 
 
 def setup_langfuse() -> bool:
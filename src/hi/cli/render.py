@@ -0,0 +1,167 @@
+"""Incremental rendering of streamed tool calls.
+
+The command to confirm is shown while the model is still generating it, and
+pre-flight checks start as soon as the `command` argument is complete, instead
+of waiting for the full response and the confirmation interrupt.
+"""
+
+import asyncio
+import re
+import shlex
+import shutil
+from typing import Any
+
+import asyncclick as click
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.utils.json import parse_partial_json
+
+from hi.graph.configuration import CommandPolicy
+from hi.graph.policy import classify_command
+
+_SHELL_KEYWORDS = {
+    "!", ".", ":", "[", "[[", "{", "}", "alias", "bg", "case", "cd", "declare",
+    "do", "done", "echo", "elif", "else", "esac", "eval", "exec", "exit", "export",
+    "false", "fg", "fi", "for", "function", "if", "jobs", "local", "printf", "pwd",
+    "read", "return", "set", "shift", "source", "test", "then", "time", "trap",
+    "true", "type", "ulimit", "umask", "unset", "until", "wait", "while",
+}  # fmt: skip
+_COMMAND_PREFIXES = {"sudo", "env", "nohup", "nice", "time", "command", "exec"}
+_SEPARATORS = {";", "&&", "||", "|", "&", "(", ")", ";;", "|&", "\n"}
+_ASSIGNMENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*=")
+_DESTRUCTIVE_RE = re.compile(
+    r"\brm\s+-[a-zA-Z]*[rf]|\bmkfs\b|\bdd\b.*\bof=|>\s*/dev/sd|\bshred\b"
+    r"|\bchmod\s+-R\b|\bchown\s+-R\b|\bgit\s+push\b.*--force|\bgit\s+reset\s+--hard\b"
+)
+
+_LABELS = {
+    "command": f"-----\n{click.style('Command to execute: `', 'green')}",
+    "explanation": f"{click.style('`', 'green')}\n{click.style('Explanation: ', 'green')}",
+}
+_COLORS = {"command": "red", "explanation": "bright_green"}
+
+
+def command_names(command: str) -> list[str]:
+    """Return the names of the programs a shell command line runs."""
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        tokens = list(lexer)
+    except ValueError:  # Unbalanced quotes
+        return []
+
+    names = []
+    expect_name = True
+    for token in tokens:
+        if token in _SEPARATORS:
+            expect_name = True
+        elif expect_name and not (
+            _ASSIGNMENT_RE.match(token) or token in _COMMAND_PREFIXES
+        ):
+            names.append(token)
+            expect_name = False
+    return names
+
+
+def preflight(command: str, policy: CommandPolicy | None = None) -> list[str]:
+    """Run quick checks on a command before it is confirmed.
+
+    Args:
+        command: The command to check.
+        policy: The allow and deny rules used to explain why confirmation is needed.
+
+    Returns:
+        list[str]: Warnings to show next to the confirmation prompt.
+    """
+    warnings = []
+    for name in command_names(command):
+        if name not in _SHELL_KEYWORDS and not shutil.which(name):
+            warnings.append(f"`{name}` was not found on PATH.")
+    if _DESTRUCTIVE_RE.search(command):
+        warnings.append("This command may delete or overwrite data.")
+    else:
+        decision = classify_command(command, policy)
+        if not decision.read_only:
+            warnings.append(f"Needs confirmation: {decision.reason}.")
+    return warnings
+
+
+class ToolCallRenderer:
+    """Render the arguments of a streamed tool call as they arrive."""
+
+    def __init__(self, policy: CommandPolicy | None = None) -> None:
+        """Initialize the renderer.
+
+        Args:
+            policy: The command policy used by the pre-flight checks.
+        """
+        self._policy = policy
+        self._reset(None)
+
+    def _reset(self, message_id: str | None) -> None:
+        self._message_id = message_id
+        self._args = ""
+        self._printed: dict[str, str] = {}
+        self.command: str | None = None
+        self._preflight: asyncio.Task[list[str]] | None = None
+
+    def feed(self, chunk: AIMessageChunk) -> None:
+        """Render the tool call arguments contained in a message chunk."""
+        if not chunk.tool_call_chunks:
+            return
+        if chunk.id != self._message_id:
+            self._reset(chunk.id)
+
+        # Parallel tool calls are not supported, only the first one is shown
+        for tool_call_chunk in chunk.tool_call_chunks:
+            if tool_call_chunk.get("index") in (None, 0):
+                self._args += tool_call_chunk.get("args") or ""
+
+        args = parse_partial_json(self._args) if self._args else None
+        if isinstance(args, dict):
+            # The command is complete once the model moved on to another argument
+            keys = list(args)
+            complete = "command" in keys and keys[-1] != "command"
+            self._render(args, complete)
+
+    def finish(self, message: AIMessage) -> None:
+        """Render the rest of the tool call once the full message is received."""
+        if not message.tool_calls:
+            return
+        if message.id != self._message_id:
+            self._reset(message.id)
+        self._render(message.tool_calls[0]["args"], complete=True)
+        if self._printed:
+            click.echo()
+
+    def _render(self, args: dict[str, Any], complete: bool) -> None:
+        for field in ("command", "explanation"):
+            value = args.get(field)
+            if not isinstance(value, str):
+                return
+            printed = self._printed.get(field)
+            if printed is None:
+                click.echo(_LABELS[field], nl=False)
+                printed = ""
+            if value.startswith(printed):
+                click.echo(click.style(value[len(printed) :], _COLORS[field]), nl=False)
+                printed = value
+            self._printed[field] = printed
+
+            if field == "command":
+                if not complete:
+                    return
+                if self._preflight is None:
+                    self.command = value
+                    self._preflight = asyncio.create_task(
+                        asyncio.to_thread(preflight, value, self._policy)
+                    )
+
+    def shown(self, command: str) -> bool:
+        """Check whether a command has already been rendered in full."""
+        return self.command == command and self._printed.get("command") == command
+
+    async def warnings(self, command: str) -> list[str]:
+        """Return the pre-flight warnings of a command, starting the checks if needed."""
+        if self._preflight is None or self.command != command:
+            return await asyncio.to_thread(preflight, command, self._policy)
+        return await self._preflight
@@ -0,0 +1,176 @@
+"""Relevance-ranked selection of pane content for the model context.
+
+Pane captures are split into fixed-size line chunks which are scored against the
+user prompt with a cheap BM25-style lexical similarity, a recency bonus and a boost
+for error patterns such as tracebacks. The best chunks are kept within a token
+budget; the tail of the current pane is always kept.
+"""
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Mapping, Sequence
+
+DEFAULT_CHUNK_LINES = 20
+"""Number of lines per scored chunk."""
+
+RECENCY_WEIGHT = 0.3
+CURRENT_PANE_BONUS = 0.2
+ERROR_BOOST = 0.6
+
+_TERM_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_.\-/]*")
+_ERROR_RE = re.compile(
+    r"Traceback \(most recent call last\)|\berror\b:|\bERROR\b|\w+(?:Error|Exception)\b"
+    r"|\bFAILED\b|\bfatal:|\bpanic:|command not found|No such file or directory"
+    r"|Segmentation fault|Permission denied",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class Chunk:
+    """A contiguous range of lines from one pane."""
+
+    pane_id: str
+    start: int
+    lines: Sequence[str]
+    score: float = 0.0
+    terms: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def end(self) -> int:
+        """Index one past the last line of the chunk."""
+        return self.start + len(self.lines)
+
+    @property
+    def tokens(self) -> int:
+        """Estimated number of tokens in the chunk."""
+        return estimate_tokens("\n".join(self.lines))
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text (roughly four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase lexical terms."""
+    return [t.lower() for t in _TERM_RE.findall(text) if len(t) > 1]
+
+
+def _strip_trailing_blank(lines: Sequence[str]) -> Sequence[str]:
+    end = len(lines)
+    while end and not lines[end - 1].strip():
+        end -= 1
+    return lines[:end]
+
+
+def _score_chunks(chunks: list[Chunk], query: str, current_pane_id: str) -> None:
+    """Score chunks in place against the query."""
+    query_terms = set(tokenize(query))
+    doc_freq: Counter[str] = Counter()
+    for chunk in chunks:
+        chunk.terms = Counter(tokenize("\n".join(chunk.lines)))
+        doc_freq.update(query_terms.intersection(chunk.terms))
+
+    n_chunks = len(chunks)
+    pane_lengths: dict[str, int] = {}
+    for chunk in chunks:
+        pane_lengths[chunk.pane_id] = max(pane_lengths.get(chunk.pane_id, 0), chunk.end)
+
+    for chunk in chunks:
+        lexical = 0.0
+        for term in query_terms:
+            tf = chunk.terms.get(term, 0)
+            if tf:
+                idf = math.log(
+                    1 + (n_chunks - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5)
+                )
+                lexical += idf * tf / (tf + 1.2)
+        if query_terms:
+            lexical /= len(query_terms)
+
+        recency = chunk.end / pane_lengths[chunk.pane_id]
+        errors = len(_ERROR_RE.findall("\n".join(chunk.lines)))
+        chunk.score = (
+            lexical
+            + RECENCY_WEIGHT * recency
+            + (CURRENT_PANE_BONUS if chunk.pane_id == current_pane_id else 0.0)
+            + (ERROR_BOOST * min(1.0, 0.5 + 0.1 * errors) if errors else 0.0)
+        )
+
+
+def _render(lines: Sequence[str], ranges: list[tuple[int, int]]) -> str:
+    """Render the selected line ranges of a pane, marking omitted lines."""
+    parts = []
+    cursor = 0
+    for start, end in sorted(ranges):
+        if start > cursor:
+            parts.append(f"[... {start - cursor} lines omitted ...]")
+        start = max(start, cursor)
+        if end > start:
+            parts.extend(lines[start:end])
+            cursor = end
+    return "\n".join(parts)
+
+
+def select_context(
+    window_content: Mapping[str, Sequence[str]],
+    current_pane_id: str,
+    query: str,
+    token_budget: int | None,
+    tail_lines: int = 40,
+    chunk_lines: int = DEFAULT_CHUNK_LINES,
+) -> dict[str, str]:
+    """Select the pane content most relevant to a query within a token budget.
+
+    Args:
+        window_content: Captured lines indexed by pane ID.
+        current_pane_id: ID of the pane `hi` was started from. Its tail is always kept.
+        query: The user prompt the content is ranked against.
+        token_budget: Approximate token budget. `None` keeps all content.
+        tail_lines: Number of trailing lines of the current pane that are always kept.
+        chunk_lines: Number of lines per scored chunk.
+
+    Returns:
+        dict: The selected content indexed by pane ID, in the original pane order.
+            Panes without any selected content are omitted, except the current pane.
+    """
+    panes = {
+        pane_id: _strip_trailing_blank(lines)
+        for pane_id, lines in window_content.items()
+    }
+    full = {pane_id: "\n".join(lines) for pane_id, lines in panes.items()}
+    if (
+        token_budget is None
+        or sum(estimate_tokens(t) for t in full.values()) <= token_budget
+    ):
+        return full
+
+    ranges: dict[str, list[tuple[int, int]]] = {pane_id: [] for pane_id in panes}
+    budget = token_budget
+    chunks: list[Chunk] = []
+    for pane_id, lines in panes.items():
+        end = len(lines)
+        if pane_id == current_pane_id:
+            tail_start = max(0, end - tail_lines)
+            ranges[pane_id].append((tail_start, end))
+            budget -= estimate_tokens("\n".join(lines[tail_start:end]))
+            end = tail_start
+        for start in range(0, end, chunk_lines):
+            stop = min(start + chunk_lines, end)
+            chunks.append(Chunk(pane_id, start, lines[start:stop]))
+
+    _score_chunks(chunks, query, current_pane_id)
+    for chunk in sorted(chunks, key=lambda c: c.score, reverse=True):
+        tokens = chunk.tokens
+        if tokens <= budget:
+            ranges[chunk.pane_id].append((chunk.start, chunk.end))
+            budget -= tokens
+
+    return {
+        pane_id: _render(panes[pane_id], pane_ranges)
+        for pane_id, pane_ranges in ranges.items()
+        if pane_ranges or pane_id == current_pane_id
+    }
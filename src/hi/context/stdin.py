@@ -0,0 +1,89 @@
+"""Bounded-memory capture of piped standard input.
+
+Large inputs are reduced while streaming: the first lines, the last lines and a
+uniform random sample of the lines in between are kept, so memory use does not
+depend on the size of the input.
+"""
+
+import random
+from collections import deque
+from typing import IO, Iterator
+
+STDIN_PANE_ID = "stdin"
+"""Pseudo pane ID under which piped input is stored in the window content."""
+
+MAX_LINE_LENGTH = 2000
+"""Lines longer than this are truncated."""
+
+
+def _read_lines(stream: IO[bytes], max_line_length: int) -> Iterator[str]:
+    """Yield decoded lines of a binary stream, truncating overlong lines."""
+    while line := stream.readline(max_line_length):
+        if len(line) == max_line_length and not line.endswith(b"\n"):
+            # Discard the rest of an overlong line
+            while (rest := stream.readline(max_line_length)) and not rest.endswith(
+                b"\n"
+            ):
+                pass
+            yield line.decode(errors="replace") + " [... line truncated ...]"
+        else:
+            yield line.decode(errors="replace").rstrip("\r\n")
+
+
+def read_stream(
+    stream: IO[bytes],
+    max_lines: int = 800,
+    max_line_length: int = MAX_LINE_LENGTH,
+    seed: int = 0,
+) -> list[str]:
+    """Read a stream into at most about `max_lines` lines.
+
+    A quarter of the budget goes to the head of the stream, half to its tail and
+    the remaining quarter to a reservoir sample of the middle. Omitted ranges are
+    replaced by a marker line.
+
+    Args:
+        stream: Binary stream to read, e.g. `sys.stdin.buffer`.
+        max_lines: Maximum number of content lines to keep.
+        max_line_length: Lines longer than this (in bytes) are truncated.
+        seed: Seed for the middle sample, so that captures are reproducible.
+
+    Returns:
+        list[str]: The kept lines in their original order.
+    """
+    head_lines = max_lines // 4
+    tail_lines = max_lines // 2
+    sample_lines = max_lines - head_lines - tail_lines
+
+    rng = random.Random(seed)
+    head: list[str] = []
+    tail: deque[tuple[int, str]] = deque()
+    sample: list[tuple[int, str]] = []
+    n_middle = 0
+
+    for index, line in enumerate(_read_lines(stream, max_line_length)):
+        if index < head_lines:
+            head.append(line)
+            continue
+
+        tail.append((index, line))
+        if len(tail) <= tail_lines:
+            continue
+
+        # The oldest tail line moves to the middle: reservoir-sample it
+        evicted = tail.popleft()
+        n_middle += 1
+        if len(sample) < sample_lines:
+            sample.append(evicted)
+        elif (slot := rng.randrange(n_middle)) < sample_lines:
+            sample[slot] = evicted
+
+    lines = list(head)
+    cursor = len(head)
+    for index, line in [*sorted(sample), *tail]:
+        if index > cursor:
+            lines.append(f"[... {index - cursor} lines omitted ...]")
+        lines.append(line)
+        cursor = index + 1
+
+    return lines
@@ -55,6 +55,24 @@ class Tmux:
         """Get the output of the current window."""
         return self.capture_window(self.current_window, lines)
 
+    def capture_session(self, lines: int | None = None) -> dict[str, str | list[str]]:
+        """Get the output of every window in the current session.
+
+        Panes of the current window come first, followed by the panes of the
+        other windows of the session.
+        """
+        current_window = self.current_window
+        pane_outputs = self.capture_window(current_window, lines)
+        start = None if lines is None else -lines
+        for window in current_window.session.windows:
+            if window.id == current_window.id:
+                continue
+            for pane in window.panes:
+                if pane.id is not None:
+                    pane_outputs[pane.id] = pane.capture_pane(start=start)
+
+        return pane_outputs
+
     @property
     def _current_window_idx(self) -> int:
         """Get the current window ID."""
@@ -0,0 +1,277 @@
+"""Event-driven watching of tmux panes.
+
+A `PaneWatcher` attaches to a tmux session as a read-only control-mode client
+(`tmux -C`) and receives `%output` notifications for every pane of the session,
+which it keeps in rolling per-pane buffers. The running command of watched panes
+is followed with a format subscription, so that no pane is ever polled.
+Waiters are only woken up when one of their triggers fires: a regex match, the
+pane going idle or the pane's running process exiting.
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable
+
+SHELLS = {"bash", "zsh", "fish", "sh", "dash", "ksh", "tcsh", "csh", "nu", "xonsh"}
+"""Commands that are considered idle shells, i.e. no process is running."""
+
+DEFAULT_BUFFER_LINES = 1000
+
+_OCTAL_RE = re.compile(rb"\\([0-7]{3})")
+_ANSI_RE = re.compile(
+    r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[@-Z\\-_]"
+)
+
+
+class WatchError(Exception):
+    """Raised when a pane cannot be watched."""
+
+    pass
+
+
+@dataclass
+class Trigger:
+    """Conditions on which a waiter is woken up. Any of them fires."""
+
+    pattern: re.Pattern[str] | None = None
+    """Fires on the first new line matching the pattern."""
+    idle_seconds: float | None = None
+    """Fires when the pane produced no output for this many seconds."""
+    on_exit: bool = False
+    """Fires when the process running in the pane exits."""
+
+
+@dataclass
+class WatchEvent:
+    """The reason a waiter was woken up."""
+
+    trigger: str
+    """One of `pattern`, `idle`, `exit` or `timeout`."""
+    line: str = ""
+    """The matching line, for `pattern` events."""
+
+
+@dataclass
+class PaneBuffer:
+    """Rolling buffer of the output of a pane."""
+
+    lines: deque[str]
+    partial: str = ""
+    last_output: float = field(default_factory=time.monotonic)
+    command: str = ""
+    dead: bool = False
+    waiters: list[tuple[Trigger, asyncio.Future[WatchEvent]]] = field(
+        default_factory=list
+    )
+
+    def tail(self, n: int) -> list[str]:
+        """Return the last `n` lines, including the incomplete last line."""
+        lines = [*self.lines, self.partial] if self.partial else list(self.lines)
+        return lines[-n:]
+
+
+def decode_output(data: str) -> str:
+    """Decode the octal escapes of `%output` data and strip terminal sequences."""
+    raw = _OCTAL_RE.sub(lambda m: bytes([int(m.group(1), 8)]), data.encode())
+    return _ANSI_RE.sub("", raw.decode(errors="replace"))
+
+
+class PaneWatcher:
+    """Control-mode client following the panes of one tmux session."""
+
+    def __init__(
+        self, session_id: str, buffer_lines: int = DEFAULT_BUFFER_LINES
+    ) -> None:
+        """Initialize the watcher. Call `start` to connect."""
+        self.session_id = session_id
+        self.buffer_lines = buffer_lines
+        self.buffers: dict[str, PaneBuffer] = {}
+        self._proc: asyncio.subprocess.Process | None = None
+        self._reader: asyncio.Task[None] | None = None
+        self._subscribed: set[str] = set()
+
+    async def start(self) -> None:
+        """Attach to the session as a read-only control-mode client."""
+        self._proc = await asyncio.create_subprocess_exec(
+            "tmux",
+            "-C",
+            "attach-session",
+            "-t",
+            self.session_id,
+            "-f",
+            "read-only,ignore-size",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        attached = asyncio.get_running_loop().create_future()
+        self._reader = asyncio.create_task(self._read(attached))
+        await asyncio.wait_for(attached, timeout=5)
+
+    @property
+    def running(self) -> bool:
+        """Check whether the control-mode client is still connected."""
+        return self._proc is not None and self._proc.returncode is None
+
+    async def close(self) -> None:
+        """Detach from the session."""
+        if self._proc and self._proc.stdin and self.running:
+            self._proc.stdin.close()
+            await self._proc.wait()
+        if self._reader:
+            await self._reader
+
+    def _buffer(self, pane_id: str) -> PaneBuffer:
+        if pane_id not in self.buffers:
+            self.buffers[pane_id] = PaneBuffer(deque(maxlen=self.buffer_lines))
+        return self.buffers[pane_id]
+
+    async def _read(self, attached: asyncio.Future[None]) -> None:
+        assert self._proc and self._proc.stdout
+        while line := await self._proc.stdout.readline():
+            text = line.decode(errors="replace").rstrip("\n")
+            if text.startswith("%output "):
+                parts = text.split(" ", 2)
+                data = parts[2] if len(parts) > 2 else ""
+                self._on_output(parts[1], decode_output(data))
+            elif text.startswith("%subscription-changed "):
+                head, _, value = text.partition(" : ")
+                self._on_command(head.split(" ")[5], value)
+            elif text.startswith("%session-changed") and not attached.done():
+                attached.set_result(None)
+
+        # The connection was closed: the session is gone or tmux exited
+        if not attached.done():
+            attached.set_exception(WatchError(f"Cannot attach to {self.session_id}."))
+        for buffer in self.buffers.values():
+            buffer.dead = True
+            self._wake(buffer, lambda trigger: trigger.on_exit, "exit")
+
+    def _on_output(self, pane_id: str, text: str) -> None:
+        buffer = self._buffer(pane_id)
+        buffer.last_output = time.monotonic()
+        *complete, buffer.partial = (buffer.partial + text).split("\n")
+        for line in complete:
+            # Keep what a carriage return would leave visible
+            line = line.rstrip("\r").rsplit("\r", 1)[-1]
+            buffer.lines.append(line)
+            self._wake(
+                buffer,
+                lambda trigger: bool(trigger.pattern and trigger.pattern.search(line)),
+                "pattern",
+                line,
+            )
+
+    def _on_command(self, pane_id: str, value: str) -> None:
+        buffer = self._buffer(pane_id)
+        command, _, dead = value.rpartition(" ")
+        exited = dead == "1" or (
+            buffer.command not in SHELLS and bool(buffer.command) and command in SHELLS
+        )
+        buffer.command = command
+        buffer.dead = dead == "1"
+        if exited:
+            self._wake(buffer, lambda trigger: trigger.on_exit, "exit")
+
+    def _wake(
+        self,
+        buffer: PaneBuffer,
+        fired: Callable[[Trigger], bool],
+        reason: str,
+        line: str = "",
+    ) -> None:
+        for trigger, future in list(buffer.waiters):
+            if not future.done() and fired(trigger):
+                future.set_result(WatchEvent(reason, line))
+
+    async def _send(self, command: str) -> None:
+        assert self._proc and self._proc.stdin
+        self._proc.stdin.write(command.encode() + b"\n")
+        await self._proc.stdin.drain()
+
+    async def _subscribe(self, pane_id: str) -> None:
+        """Follow the running command of a pane."""
+        if pane_id in self._subscribed:
+            return
+        proc = await asyncio.create_subprocess_exec(
+            "tmux",
+            "display-message",
+            "-p",
+            "-t",
+            pane_id,
+            "#{pane_current_command}",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await proc.communicate()
+        if proc.returncode:
+            raise WatchError(f"Pane {pane_id} does not exist.")
+        self._buffer(pane_id).command = stdout.decode().strip()
+        name = f"hi{pane_id.lstrip('%')}"
+        await self._send(
+            f"refresh-client -B '{name}:{pane_id}:#{{pane_current_command}} #{{pane_dead}}'"
+        )
+        self._subscribed.add(pane_id)
+
+    async def wait(self, pane_id: str, trigger: Trigger, timeout: float) -> WatchEvent:
+        """Wait until a trigger fires for a pane, or the timeout expires."""
+        if trigger.on_exit:
+            await self._subscribe(pane_id)
+
+        buffer = self._buffer(pane_id)
+        future: asyncio.Future[WatchEvent] = asyncio.get_running_loop().create_future()
+        buffer.waiters.append((trigger, future))
+        started = time.monotonic()
+        deadline = started + timeout
+        try:
+            while True:
+                now = time.monotonic()
+                wake_at = deadline
+                if trigger.idle_seconds is not None:
+                    idle_at = max(buffer.last_output, started) + trigger.idle_seconds
+                    if idle_at <= now:
+                        return WatchEvent("idle")
+                    wake_at = min(wake_at, idle_at)
+                if now >= deadline:
+                    return WatchEvent("timeout")
+                # Sleep until the next idle deadline, unless a trigger fires first
+                done, _ = await asyncio.wait([future], timeout=wake_at - now)
+                if done:
+                    return future.result()
+        finally:
+            buffer.waiters.remove((trigger, future))
+
+
+_watchers: dict[str, PaneWatcher] = {}
+
+
+async def get_watcher(pane_id: str) -> PaneWatcher:
+    """Return the watcher of the session a pane belongs to, connecting if needed."""
+    if not os.environ.get("TMUX"):
+        raise WatchError("Not running inside tmux.")
+
+    proc = await asyncio.create_subprocess_exec(
+        "tmux",
+        "display-message",
+        "-p",
+        "-t",
+        pane_id,
+        "#{session_id}",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    stdout, _ = await proc.communicate()
+    session_id = stdout.decode().strip()
+    if proc.returncode or not session_id:
+        raise WatchError(f"Pane {pane_id} does not exist.")
+
+    watcher = _watchers.get(session_id)
+    if watcher is None or not watcher.running:
+        watcher = PaneWatcher(session_id)
+        await watcher.start()
+        _watchers[session_id] = watcher
+    return watcher
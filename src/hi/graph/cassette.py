@@ -0,0 +1,256 @@
+"""Record sessions as cassettes and replay them deterministically.
+
+A cassette holds everything a session depended on: the captured window content,
+the user prompts, the model responses and the tool outputs. Replaying runs the
+current graph against the cassette with a fake model that returns the recorded
+responses and tools that return the recorded outputs, so that changes to the
+prompts, the context format or the graph can be measured on real workloads
+without calling a model or running commands.
+"""
+
+import functools
+import json
+import time
+import uuid
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    ToolMessage,
+    messages_from_dict,
+    messages_to_dict,
+)
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, StructuredTool
+from langchain_core.tools import tool as create_tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.checkpoint.memory import InMemorySaver
+
+from hi.context.selector import estimate_tokens
+from hi.graph.configuration import Configuration
+from hi.graph.graph import build_graph
+from hi.graph.store import BLOB_STORE, pane_lines, resolve_content
+from hi.graph.tools import TOOLS
+from hi.graph.utils import get_message_text
+
+CASSETTE_VERSION = 1
+
+END_OF_CASSETTE = "(end of cassette)"
+"""Response of the fake model once the recorded responses are exhausted."""
+
+
+@dataclass
+class Cassette:
+    """A recorded session."""
+
+    window_content: dict[str, list[str]]
+    current_pane_id: str
+    messages: list[BaseMessage]
+    model: str = ""
+
+    @property
+    def prompts(self) -> list[str]:
+        """Return the prompts typed by the user, in order."""
+        return [
+            get_message_text(message)
+            for message in self.messages
+            if isinstance(message, HumanMessage)
+        ]
+
+
+def save_cassette(
+    path: str | Path,
+    messages: Sequence[BaseMessage],
+    window_content: dict[str, Any],
+    current_pane_id: str,
+    model: str = "",
+) -> None:
+    """Write a session to a cassette file.
+
+    Stored blobs are resolved, as the cassette must outlive the session.
+    """
+    messages = [
+        message.model_copy(update={"content": resolve_content(message.content)})
+        if isinstance(message, ToolMessage)
+        else message
+        for message in messages
+    ]
+    data = {
+        "version": CASSETTE_VERSION,
+        "created": time.time(),
+        "model": model,
+        "current_pane_id": current_pane_id,
+        "window_content": {
+            pane_id: pane_lines(content) for pane_id, content in window_content.items()
+        },
+        "messages": messages_to_dict(messages),
+    }
+    Path(path).expanduser().write_text(json.dumps(data, ensure_ascii=False))
+
+
+def load_cassette(path: str | Path) -> Cassette:
+    """Read a cassette file."""
+    data = json.loads(Path(path).expanduser().read_text())
+    if data.get("version") != CASSETTE_VERSION:
+        raise ValueError(f"{path}: unsupported cassette version {data.get('version')}")
+    return Cassette(
+        window_content=data["window_content"],
+        current_pane_id=data["current_pane_id"],
+        messages=messages_from_dict(data["messages"]),
+        model=data.get("model", ""),
+    )
+
+
+@functools.cache
+def _encoding() -> Any:
+    """Return the tiktoken encoding, or None if it is not available offline."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # Not installed, or the encoding cannot be downloaded
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of a text with `cl100k_base`, or estimate them."""
+    encoding = _encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def prompt_tokens(messages: Sequence[BaseMessage], tools: Sequence[Any] = ()) -> int:
+    """Count the tokens of a prompt, including the tool schemas bound to the model."""
+    total = sum(count_tokens(json.dumps(tool)) for tool in tools)
+    for message in messages:
+        total += 4 + count_tokens(get_message_text(message))  # Role and separators
+        if isinstance(message, AIMessage):
+            total += sum(
+                count_tokens(tool_call["name"] + json.dumps(tool_call["args"]))
+                for tool_call in message.tool_calls
+            )
+    return total
+
+
+class CassetteModel(BaseChatModel):
+    """Return the recorded responses in order and count the prompt tokens."""
+
+    responses: list[AIMessage]
+    tools: list[dict[str, Any]] = []
+    prompt_tokens: list[int] = []
+    """Prompt tokens of every call, appended as the model is called."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "CassetteModel":
+        """Keep the tool schemas to count them in the prompt."""
+        self.tools = [convert_to_openai_tool(tool) for tool in tools]
+        return self
+
+    def _generate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        self.prompt_tokens.append(prompt_tokens(messages, self.tools))
+        if len(self.prompt_tokens) <= len(self.responses):
+            message = self.responses[len(self.prompt_tokens) - 1]
+        else:
+            message = AIMessage(content=END_OF_CASSETTE)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def stub_tools(cassette: Cassette, tools: Sequence[Any]) -> list[BaseTool]:
+    """Build tools with the same schemas that return the recorded outputs in order."""
+    outputs: dict[str, deque[Any]] = defaultdict(deque)
+    for message in cassette.messages:
+        if isinstance(message, ToolMessage) and message.name:
+            outputs[message.name].append(message.content)
+
+    def _stub(name: str) -> Any:
+        async def _run(**kwargs: Any) -> Any:
+            return outputs[name].popleft() if outputs[name] else END_OF_CASSETTE
+
+        return _run
+
+    stubs: list[BaseTool] = []
+    for tool in tools:
+        real = tool if isinstance(tool, BaseTool) else create_tool(tool)
+        stubs.append(
+            StructuredTool.from_function(
+                coroutine=_stub(real.name),
+                name=real.name,
+                description=real.description,
+                args_schema=real.args_schema,
+            )
+        )
+    return stubs
+
+
+async def replay(
+    cassette: Cassette, config_obj: Configuration | None = None
+) -> dict[str, Any]:
+    """Replay a cassette against the current graph and measure it.
+
+    Returns:
+        dict: Steps, prompt tokens per step and time spent in every node.
+    """
+    model = CassetteModel(
+        responses=[m for m in cassette.messages if isinstance(m, AIMessage)]
+    )
+    # Every model call of the graph goes to the fake model
+    graph = build_graph(
+        stub_tools(cassette, TOOLS), InMemorySaver(), lambda model_config: model
+    )
+    config_obj = (config_obj or Configuration()).model_copy(
+        update={"auto_approve": True}
+    )
+    thread_id = str(uuid.uuid4())
+    config: RunnableConfig = {
+        "configurable": {
+            "thread_id": thread_id,
+            **config_obj.model_dump(exclude_none=True),
+        },
+        "recursion_limit": 1000,
+    }
+
+    node_seconds: dict[str, float] = defaultdict(float)
+    start = time.perf_counter()
+    try:
+        for i, prompt in enumerate(cassette.prompts):
+            graph_input: dict[str, Any] = {"messages": prompt}
+            if i == 0:
+                graph_input["window_content"] = {
+                    pane_id: BLOB_STORE.put("\n".join(lines), thread_id)
+                    for pane_id, lines in cassette.window_content.items()
+                }
+                graph_input["current_pane_id"] = cassette.current_pane_id
+            last = time.perf_counter()
+            async for event in graph.astream(
+                graph_input, config=config, stream_mode="updates", durability="exit"
+            ):
+                # Nodes run one after the other, so the time since the previous
+                # update is the time spent in this node
+                now = time.perf_counter()
+                for node in event:
+                    node_seconds[node] += now - last
+                last = now
+    finally:
+        BLOB_STORE.release(thread_id)
+
+    return {
+        "steps": len(model.prompt_tokens),
+        "prompt_tokens": sum(model.prompt_tokens),
+        "step_prompt_tokens": model.prompt_tokens,
+        "unused_responses": max(0, len(model.responses) - len(model.prompt_tokens)),
+        "node_seconds": dict(node_seconds),
+        "wall_seconds": time.perf_counter() - start,
+    }
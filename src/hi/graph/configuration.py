@@ -9,9 +9,86 @@ from langgraph.config import get_config
 from pydantic import BaseModel, Field
 
 from hi.graph import prompts
+from hi.graph.serialization import Serialization
 
 DEFAULT_CONFIG_PATH = Path("~/.config/hi/config.yaml").expanduser().resolve()
 DEFAULT_ENV_PATH = Path("~/.config/hi/env").expanduser().resolve()
+DEFAULT_DENY_PATHS = ("~/.ssh", "~/.aws", "~/.gnupg", "~/.config/hi", "*.env")
+"""Paths holding credentials, which are only read after confirmation."""
+
+
+class ModelPrices(BaseModel):
+    """Prices of a language model in USD per million tokens."""
+
+    input: float = 0
+    output: float = 0
+    cached_input: float = Field(
+        default=0, description="Price of input tokens read from the prompt cache."
+    )
+
+
+class BudgetConfig(BaseModel):
+    """Token and cost limits for a session. A limit is reached when either is met."""
+
+    tokens: int | None = Field(
+        default=None, description="Maximum number of input and output tokens."
+    )
+    cost: float | None = Field(default=None, description="Maximum cost in USD.")
+
+
+class CommandPolicy(BaseModel):
+    """Rules for running commands without confirmation."""
+
+    auto_approve_read_only: bool = Field(
+        default=True,
+        description="Run commands that are classified as read-only without asking "
+        "for confirmation.",
+    )
+    allow: list[str] = Field(
+        default_factory=list,
+        description="Additional read-only commands, as word prefixes, "
+        "e.g. 'make -n' or 'terraform plan'.",
+    )
+    deny: list[str] = Field(
+        default_factory=list,
+        description="Commands that always require confirmation, as word prefixes, "
+        "e.g. 'sudo'. Deny rules take precedence over allow rules.",
+    )
+    deny_paths: list[str] = Field(
+        default_factory=lambda: list(DEFAULT_DENY_PATHS),
+        description="Files that are only read after confirmation, by commands and "
+        "file tools alike, as globs, e.g. '.env' or '~/.ssh'. Globs without a '/' "
+        "match file names. Files in denied directories are denied as well, and "
+        "search_files skips them. Setting this list replaces the default one.",
+    )
+    log_decisions: bool = Field(
+        default=True,
+        description="Log classification decisions to ~/.config/hi/policy.jsonl.",
+    )
+
+
+class ResourceLimits(BaseModel):
+    """Limits applied to every command run by the agent. Null disables a limit."""
+
+    cpu_seconds: int | None = Field(
+        default=None, description="CPU time limit of each process of a command."
+    )
+    memory_mb: int | None = Field(
+        default=None, description="Address space limit of each process, in MiB."
+    )
+    file_size_mb: int | None = Field(
+        default=None, description="Maximum size of the files a command writes, in MiB."
+    )
+    processes: int | None = Field(
+        default=None,
+        description="Maximum number of processes of the user while the command runs. "
+        "Note that this counts all processes of the user, not only the command's.",
+    )
+    kill_after: float | None = Field(
+        default=600,
+        description="Kill the process group of a command after this many seconds, "
+        "including commands still running in the background after command_timeout.",
+    )
 
 
 class ModelConfig(BaseModel):
@@ -28,6 +105,27 @@ class ModelConfig(BaseModel):
         default_factory=dict,
         description="Additional keyword arguments for the model, such as temperature, max_tokens, etc.",
     )
+    prices: ModelPrices = Field(
+        default_factory=ModelPrices,
+        description="Prices used to compute the cost of a session.",
+    )
+    requests_per_second: float | None = Field(
+        default=None,
+        description="Maximum request rate to the model. The limiter is shared by all "
+        "hi processes using the same provider key, gives priority to interactive "
+        "sessions over batch runs, and backs off when the provider answers with 429.",
+    )
+    warm_up: bool = Field(
+        default=False,
+        description="Send a minimal request to the model when hi starts, so that a "
+        "self-hosted model (Ollama, or an OpenAI-compatible server given by base_url) "
+        "loads while the window content is captured. Ignored for hosted providers.",
+    )
+    keep_alive: str | int | None = Field(
+        default=None,
+        description="How long Ollama keeps the model loaded after each request, "
+        "e.g. '30m', or -1 to keep it loaded. Defaults to the server's setting.",
+    )
 
 
 class Configuration(BaseModel):
@@ -51,12 +149,66 @@ class Configuration(BaseModel):
         "This prompt sets the context and behavior for the agent.",
     )
 
+    auto_approve: bool = Field(
+        default=False,
+        description="Run tool calls without asking for confirmation.",
+    )
+
+    command_policy: CommandPolicy = Field(
+        default_factory=CommandPolicy,
+        description="Which commands run without confirmation.",
+    )
+
     command_timeout: float = Field(
         default=30,
         description="The timeout in seconds for executing commands. "
         "This is used to limit how long the agent waits for command execution.",
     )
 
+    command_limits: ResourceLimits = Field(
+        default_factory=ResourceLimits,
+        description="Resource limits of executed commands.",
+    )
+
+    soft_budget: BudgetConfig | None = Field(
+        default=None,
+        description="Session usage after which the fast model is used, if configured.",
+    )
+    hard_budget: BudgetConfig | None = Field(
+        default=None,
+        description="Session usage after which the agent stops calling the model.",
+    )
+
+    context_token_budget: int | None = Field(
+        default=6000,
+        description="Approximate token budget for pane content included in the prompt. "
+        "When the captured content exceeds it, chunks are ranked by relevance to the prompt "
+        "and only the best ones are kept. Set to null to always include all content.",
+    )
+
+    context_tail_lines: int = Field(
+        default=40,
+        description="Number of trailing lines of the current pane that are always included.",
+    )
+
+    context_all_windows: bool = Field(
+        default=False,
+        description="Also capture the panes of the other windows in the current tmux session.",
+    )
+
+    serialization: Serialization = Field(
+        default="compact",
+        description="How tool results and pane content are written in the prompt: "
+        "'compact' uses key: value lines and plain headings, 'verbose' uses JSON "
+        "objects and XML tags.",
+    )
+
+    stdin_max_lines: int = Field(
+        default=800,
+        description="Maximum number of lines kept from piped input. Longer input is "
+        "reduced to its head, its tail and a sample of the lines in between.",
+    )
+
     @classmethod
     def from_context(cls) -> "Configuration":
         """Create a Configuration instance from a RunnableConfig object."""
@@ -0,0 +1,401 @@
+"""Read-only file inspection tools.
+
+These tools cover the most common commands the model runs (`cat`, `head`,
+`tail`, `grep`, `ls`) without spawning a shell. They never modify anything, so
+they run without confirmation, unless their path is one of the `deny_paths` of the
+command policy. Work is done in a worker thread and every output is capped.
+"""
+
+import asyncio
+import fnmatch
+import mmap
+import os
+import re
+import stat
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from hi.graph.configuration import CommandPolicy, Configuration
+from hi.graph.policy import denied_path
+from hi.graph.store import current_session_id, offload_fields
+
+MAX_OUTPUT_CHARS = 20_000
+"""Maximum number of characters returned by a tool."""
+
+MAX_SEARCH_FILE_SIZE = 5 * 1024 * 1024
+"""Files larger than this are skipped by `search_files`."""
+
+MAX_DIRECTORY_ENTRIES = 500
+
+MAX_UNSIZED_READ_BYTES = 1024 * 1024
+"""Bytes read from files that report a size of 0, like the files of `/proc`."""
+
+_BINARY_PROBE_SIZE = 8192
+_ALWAYS_IGNORED = {".git", ".hg", ".svn"}
+
+
+def _truncate(text: str) -> tuple[str, bool]:
+    if len(text) <= MAX_OUTPUT_CHARS:
+        return text, False
+    return text[:MAX_OUTPUT_CHARS], True
+
+
+def _is_binary(data: bytes | mmap.mmap) -> bool:
+    return data.find(b"\0", 0, _BINARY_PROBE_SIZE) != -1
+
+
+def _read_lines(path: str, start_line: int, end_line: int | None) -> dict[str, Any]:
+    file_path = Path(path).expanduser()
+    info = file_path.stat()
+    # Opening a FIFO or a device could block forever
+    if not stat.S_ISREG(info.st_mode):
+        return {"error": f"{file_path} is not a regular file."}
+
+    with open(file_path, "rb") as f:
+        if info.st_size == 0:
+            # Empty, or generated on read like the files of /proc and /sys
+            data = f.read(MAX_UNSIZED_READ_BYTES + 1)
+            complete = len(data) <= MAX_UNSIZED_READ_BYTES
+            return _window(
+                file_path, data[:MAX_UNSIZED_READ_BYTES], complete, start_line, end_line
+            )
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _window(file_path, mm, True, start_line, end_line)
+
+
+def _window(
+    file_path: Path,
+    data: bytes | mmap.mmap,
+    complete: bool,
+    start_line: int,
+    end_line: int | None,
+) -> dict[str, Any]:
+    """Return a range of lines of the content of a file.
+
+    Args:
+        file_path: The path of the file, for messages.
+        data: The content of the file.
+        complete: Whether `data` is the whole file.
+        start_line: First line to return, starting at 1.
+        end_line: Last line to return (inclusive), or None for the last one.
+    """
+    if _is_binary(data):
+        return {"error": f"{file_path} is a binary file."}
+
+    # Seek to the start line without reading the lines before it
+    start = 0
+    for _ in range(start_line - 1):
+        start = data.find(b"\n", start) + 1
+        if start == 0:
+            return {"error": f"{file_path} has fewer than {start_line} lines."}
+
+    end = start
+    line = start_line - 1
+    while end < len(data) and (end_line is None or line < end_line):
+        if end - start > MAX_OUTPUT_CHARS:
+            break
+        newline = data.find(b"\n", end)
+        end = len(data) if newline == -1 else newline + 1
+        line += 1
+
+    content, truncated = _truncate(data[start:end].decode(errors="replace"))
+    output: dict[str, Any] = {
+        "path": str(file_path),
+        "start_line": start_line,
+        "end_line": line,
+        "content": content,
+    }
+    more = end < len(data) or not complete
+    if truncated or (more and (end_line is None or line < end_line)):
+        output["truncated"] = True
+    return output
+
+
+async def read_file(
+    path: str, start_line: int = 1, end_line: int | None = None
+) -> dict[str, Any]:
+    """Read a range of lines of a text file. Prefer this over `cat`, `head` or `tail`.
+
+    Args:
+        path (str): Path of the file.
+        start_line (int): First line to read, starting at 1.
+        end_line (int): Last line to read (inclusive). Reads to the end by default.
+    """
+    try:
+        output = await asyncio.to_thread(
+            _read_lines, path, max(1, start_line), end_line
+        )
+    except OSError as e:
+        return {"error": str(e)}
+    return offload_fields(output, current_session_id())
+
+
+@dataclass
+class _IgnoreRule:
+    base: str
+    pattern: str
+    negate: bool
+    dir_only: bool
+    anchored: bool
+
+    def matches(self, path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        rel = os.path.relpath(path, self.base)
+        if self.anchored:
+            return fnmatch.fnmatch(rel, self.pattern)
+        return fnmatch.fnmatch(os.path.basename(path), self.pattern)
+
+
+def _load_gitignore(directory: str) -> list[_IgnoreRule]:
+    """Parse the `.gitignore` of a directory, if any."""
+    try:
+        with open(os.path.join(directory, ".gitignore")) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+
+    rules = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        line = line.removeprefix("!")
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        rules.append(
+            _IgnoreRule(directory, line.lstrip("/"), negate, dir_only, anchored)
+        )
+    return rules
+
+
+def _ancestor_rules(directory: str) -> list[_IgnoreRule]:
+    """Load the `.gitignore` files above a directory, up to the repository root.
+
+    Outside of a git repository only the `.gitignore` files below the directory
+    apply, as with git.
+    """
+    ancestors = []
+    parent = os.path.abspath(directory)
+    while not os.path.exists(os.path.join(parent, ".git")):
+        if os.path.dirname(parent) == parent:
+            return []
+        parent = os.path.dirname(parent)
+        ancestors.append(parent)
+    # Rules of deeper directories come last, so that they take precedence
+    return [
+        rule for ancestor in reversed(ancestors) for rule in _load_gitignore(ancestor)
+    ]
+
+
+def _ignored(rules: list[_IgnoreRule], path: str, is_dir: bool) -> bool:
+    ignored = False
+    for rule in rules:
+        if rule.matches(path, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+def _search(
+    pattern: str,
+    path: str,
+    glob: str | None,
+    max_matches: int,
+    ignore_case: bool,
+    policy: CommandPolicy,
+) -> dict[str, Any]:
+    regex = re.compile(
+        pattern.encode(), re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    )
+    root = os.path.normpath(os.path.expanduser(path))
+    if os.path.isfile(root):
+        return _format_matches(_search_file(regex, root, max_matches), 1, max_matches)
+
+    matches: list[str] = []
+    n_files = 0
+    rules_by_dir = {os.path.dirname(root): _ancestor_rules(root)}
+    for dirpath, dirnames, filenames in os.walk(root):
+        parent_rules = rules_by_dir.get(os.path.dirname(dirpath), [])
+        rules = rules_by_dir[dirpath] = parent_rules + _load_gitignore(dirpath)
+        dirnames[:] = sorted(
+            d
+            for d in dirnames
+            if d not in _ALWAYS_IGNORED
+            and not _ignored(rules, os.path.join(dirpath, d), True)
+            and not denied_path(os.path.join(dirpath, d), policy)
+        )
+        for name in sorted(filenames):
+            file_path = os.path.join(dirpath, name)
+            if (
+                (glob and not fnmatch.fnmatch(name, glob))
+                or _ignored(rules, file_path, False)
+                or denied_path(file_path, policy)
+            ):
+                continue
+            matches.extend(_search_file(regex, file_path, max_matches - len(matches)))
+            n_files += 1
+            if len(matches) >= max_matches:
+                return _format_matches(matches, n_files, max_matches)
+
+    return _format_matches(matches, n_files, max_matches)
+
+
+def _format_matches(
+    matches: list[str], n_files: int, max_matches: int
+) -> dict[str, Any]:
+    content, truncated = _truncate("\n".join(matches))
+    output: dict[str, Any] = {"matches": content, "files_searched": n_files}
+    if truncated or len(matches) >= max_matches:
+        output["truncated"] = True
+    return output
+
+
+def _search_file(regex: re.Pattern[bytes], path: str, limit: int) -> list[str]:
+    """Return up to `limit` matching lines of a file as `path:line:text`."""
+    try:
+        size = os.path.getsize(path)
+        if size == 0 or size > MAX_SEARCH_FILE_SIZE:
+            return []
+        with (
+            open(path, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+        ):
+            if _is_binary(mm):
+                return []
+            results: list[str] = []
+            line_no = 1
+            counted = 0
+            line_end = -1
+            for match in regex.finditer(mm):
+                if match.start() <= line_end:
+                    continue  # Only report each line once
+                line_start = mm.rfind(b"\n", 0, match.start()) + 1
+                line_end = mm.find(b"\n", match.start())
+                if line_end == -1:
+                    line_end = len(mm)
+                line_no += mm[counted:line_start].count(b"\n")
+                counted = line_start
+                text = mm[line_start:line_end].decode(errors="replace")
+                results.append(f"{path}:{line_no}:{text[:500]}")
+                if len(results) >= limit:
+                    break
+            return results
+    except (OSError, ValueError):
+        return []
+
+
+async def search_files(
+    pattern: str,
+    path: str = ".",
+    glob: str | None = None,
+    max_matches: int = 100,
+    ignore_case: bool = False,
+) -> dict[str, Any]:
+    """Search files for a regex, skipping files ignored by git. Prefer this over `grep`.
+
+    Files denied by the user's command policy are skipped as well.
+
+    Args:
+        pattern (str): Python regex to search for.
+        path (str): File or directory to search recursively.
+        glob (str): Only search files whose name matches this glob, e.g. '*.py'.
+        max_matches (int): Stop after this many matching lines.
+        ignore_case (bool): Search case-insensitively.
+    """
+    policy = Configuration.from_context().command_policy
+    try:
+        output = await asyncio.to_thread(
+            _search, pattern, path, glob, max(1, max_matches), ignore_case, policy
+        )
+    except re.error as e:
+        return {"error": f"Invalid pattern: {e}"}
+    return offload_fields(output, current_session_id())
+
+
+def _list_entries(
+    directory: str,
+    prefix: str,
+    depth: int,
+    show_hidden: bool,
+    rules: list[_IgnoreRule],
+    lines: list[str],
+) -> None:
+    """Append the entries of a directory and of its subdirectories to `lines`."""
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if not show_hidden and entry.name.startswith("."):
+                continue
+            try:
+                is_dir = entry.is_dir()
+                size = 0 if is_dir else entry.stat().st_size
+            except OSError:
+                is_dir, size = False, 0
+            if not show_hidden and _ignored(rules, entry.path, is_dir):
+                continue
+            entries.append((not is_dir, entry.name, size, entry.is_symlink()))
+
+    # Directories first, then files, by name, with the content of directories
+    # after their own line. Past the limit, entries are only counted.
+    for is_file, name, size, is_link in sorted(entries):
+        lines.append(f"{prefix}{name}\t{size}" if is_file else f"{prefix}{name}/")
+        if (
+            not is_file
+            and not is_link
+            and depth > 1
+            and len(lines) <= MAX_DIRECTORY_ENTRIES
+        ):
+            subdirectory = os.path.join(directory, name)
+            try:
+                _list_entries(
+                    subdirectory,
+                    f"{prefix}{name}/",
+                    depth - 1,
+                    show_hidden,
+                    rules + _load_gitignore(subdirectory),
+                    lines,
+                )
+            except OSError:
+                pass
+
+
+def _list(path: str, show_hidden: bool, max_depth: int) -> dict[str, Any]:
+    root = os.path.normpath(os.path.expanduser(path))
+    lines: list[str] = []
+    rules = _ancestor_rules(root) + _load_gitignore(root)
+    _list_entries(root, "", max_depth, show_hidden, rules, lines)
+    output: dict[str, Any] = {
+        "entries": "\n".join(lines[:MAX_DIRECTORY_ENTRIES]),
+        "count": len(lines),
+    }
+    if len(lines) > MAX_DIRECTORY_ENTRIES:
+        output["truncated"] = True
+    return output
+
+
+async def list_directory(
+    path: str = ".", show_hidden: bool = False, max_depth: int = 1
+) -> dict[str, Any]:
+    """List a directory with file sizes in bytes. Prefer this over `ls`.
+
+    Entries ignored by git are skipped, like hidden ones.
+
+    Args:
+        path (str): Directory to list.
+        show_hidden (bool): Include entries starting with a dot and entries
+            ignored by git.
+        max_depth (int): List subdirectories down to this depth, 1 for the
+            directory only.
+    """
+    try:
+        output = await asyncio.to_thread(_list, path, show_hidden, max(1, max_depth))
+    except OSError as e:
+        return {"error": str(e)}
+    return offload_fields(output, current_session_id())
+
+
+READ_ONLY_TOOLS = {"read_file", "search_files", "list_directory"}
+"""Names of tools that run without confirmation."""
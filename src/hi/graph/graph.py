@@ -4,71 +4,93 @@ This module defines the main graph structure and logic for handling conversation
 tool usage, and model interaction in the hi application.
 """
 
+import functools
 import json
-from typing import Dict, List, Literal, cast
+from typing import Any, Callable, Dict, Literal, Sequence, cast
 
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import AIMessage, AnyMessage, ToolMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import ToolNode
 from langgraph.prebuilt.tool_node import msg_content_output
 from langgraph.types import Command, interrupt
 
-from hi.graph.configuration import Configuration
+from hi.context.selector import select_context
+from hi.context.stdin import STDIN_PANE_ID
+from hi.graph.configuration import Configuration, ModelConfig
+from hi.graph.file_tools import READ_ONLY_TOOLS
+from hi.graph.policy import classify_command, denied_path, log_decision
 from hi.graph.prompts import build_system_prompt
+from hi.graph.ratelimit import ainvoke_with_backoff
+from hi.graph.serialization import Serialization, format_panes, format_tool_content
 from hi.graph.state import InputState, State
+from hi.graph.store import BLOB_STORE, current_session_id, pane_lines, resolve_content
 from hi.graph.tools import TOOLS, pending_comm_tasks, proc2output
-from hi.graph.utils import load_chat_model
+from hi.graph.usage import budget_exceeded, format_usage, message_usage
+from hi.graph.utils import get_message_text, load_chat_model
 
+ModelFactory = Callable[[ModelConfig], BaseChatModel]
+"""Function returning the chat model of a model configuration."""
 
-async def call_model(state: State) -> Dict[str, List[AnyMessage]]:
+
+async def call_model(
+    state: State, load_model: ModelFactory = load_chat_model
+) -> Dict[str, Any]:
     """Call the LLM powering our "agent".
 
     This function prepares the prompt, initializes the model, and processes the response.
 
     Args:
         state (State): The current state of the conversation.
-        config (RunnableConfig): Configuration for the model run.
+        load_model (ModelFactory): Returns the chat model to call.
 
     Returns:
         dict: A dictionary containing the model's response message.
     """
     configuration = Configuration.from_context()
 
+    if budget_exceeded(state.usage, configuration.hard_budget):
+        return {
+            "messages": [
+                AIMessage(
+                    content=f"Session budget exhausted ({format_usage(state.usage)}). Start a new session to continue."
+                )
+            ]
+        }
+
     # Initialize the model with tool binding. Change the model or add more tools here.
-    if configuration.default_model == "big_model":
+    if configuration.default_model == "smart" and not budget_exceeded(
+        state.usage, configuration.soft_budget
+    ):
         model_args = configuration.smart_model
     else:
         model_args = configuration.fast_model or configuration.smart_model
 
-    model = load_chat_model(model_args).bind_tools(TOOLS)
+    chat_model = load_model(model_args)
+    model = chat_model.bind_tools(TOOLS)
 
     # Format the system prompt. Customize this to change the agent's behavior.
-    messages = []
-    if len(state.messages) == 1:
-        other_pane_content = "\n".join(
-            f"<pane id='{pane_id}'>{content}</pane>"
-            for pane_id, content in state.get_other_panes_content().items()
-        )
-
-        first_message = state.messages[0]
-        first_message.content = f"""## Current tmux window state:
-<current_pane>{state.get_current_pane_content()}</current_pane>
-<other_panes>{other_pane_content}</other_panes>
-
-## User Prompt
-{first_message.content}"""
-        messages.append(first_message)
+    messages: list[AnyMessage] = []
+    system_message = build_system_prompt(configuration.system_prompt)
 
     # Get the model's response
-    system_message = build_system_prompt(configuration.system_prompt)
     response = cast(
         AIMessage,
-        await model.ainvoke(
-            [{"role": "system", "content": system_message}, *state.messages]
+        await ainvoke_with_backoff(
+            model,
+            [
+                {"role": "system", "content": system_message},
+                *_assemble_messages(state, configuration),
+            ],
+            chat_model.rate_limiter,
         ),
     )
     messages.append(response)
+    usage = message_usage(response, model_args.prices)
+    model_usage = {model_args.fully_specified_name: usage} if usage else {}
     if response.invalid_tool_calls:
         messages.append(
             ToolMessage(
@@ -84,31 +106,126 @@ async def call_model(state: State) -> Dict[str, List[AnyMessage]]:
                     id=response.id,
                     content="Sorry, I could not find an answer to your question in the specified number of steps.",
                 )
-            ]
+            ],
+            "usage": usage,
+            "model_usage": model_usage,
         }
 
     # Return the model's response as a list to be added to existing messages
 
-    return {"messages": messages}
+    return {"messages": messages, "usage": usage, "model_usage": model_usage}
+
+
+def _assemble_messages(state: State, configuration: Configuration) -> list[AnyMessage]:
+    """Resolve stored blobs, serialize tool results and inline the window content.
+
+    The state itself is left untouched, so that checkpoints only hold blob digests.
+    """
+    messages = [
+        message.model_copy(
+            update={
+                "content": format_tool_content(
+                    resolve_content(message.content), configuration.serialization
+                )
+            }
+        )
+        if isinstance(message, ToolMessage)
+        else message
+        for message in state.messages
+    ]
+    first_message = messages[0]
+    context = _format_context(
+        tuple(
+            (pane_id, content if isinstance(content, str) else tuple(content))
+            for pane_id, content in state.window_content.items()
+        ),
+        state.current_pane_id,
+        get_message_text(first_message),
+        configuration.context_token_budget,
+        configuration.context_tail_lines,
+        configuration.serialization,
+    )
+    messages[0] = first_message.model_copy(
+        update={
+            "content": f"""{context}
+
+## User Prompt
+{first_message.content}"""
+        }
+    )
+    return messages
+
+
+_CONTEXT_CACHE_SIZE = 32
+
+_context_cache: dict[tuple[Any, ...], str] = {}
+"""Digests of formatted window content blocks in `BLOB_STORE`, by arguments."""
+
+
+def _format_context(
+    window_content: tuple[tuple[str, str | tuple[str, ...]], ...],
+    current_pane_id: str,
+    query: str,
+    token_budget: int | None,
+    tail_lines: int,
+    serialization: Serialization,
+) -> str:
+    """Format the window content block of the first message.
+
+    The same block is rebuilt for every step of a conversation, so it is kept in
+    `BLOB_STORE` on behalf of the session, and evicted with its pane content.
+    """
+    key = (
+        window_content,
+        current_pane_id,
+        query,
+        token_budget,
+        tail_lines,
+        serialization,
+    )
+    digest = _context_cache.get(key)
+    if digest is not None and digest in BLOB_STORE:
+        return BLOB_STORE.get(digest)
+
+    pane_content = select_context(
+        {pane_id: pane_lines(content) for pane_id, content in window_content},
+        current_pane_id,
+        query,
+        token_budget,
+        tail_lines=tail_lines,
+    )
+    context = format_panes(
+        pane_content,
+        current_pane_id,
+        serialization,
+        stdin=current_pane_id == STDIN_PANE_ID,
+    )
+
+    # Forget the blocks of released sessions, and the oldest ones past the limit
+    for cached, block in list(_context_cache.items()):
+        if block not in BLOB_STORE:
+            del _context_cache[cached]
+    if len(_context_cache) >= _CONTEXT_CACHE_SIZE:
+        del _context_cache[next(iter(_context_cache))]
+    _context_cache[key] = BLOB_STORE.put(context, current_session_id())
+    return context
 
 
 async def handle_pending_tasks(state: State) -> dict:
     """Check for any pending tasks and update their status."""
     messages = []
-    for tool_call_id, task in pending_comm_tasks.items():
-        if task.done():
-            for message in state.messages:
-                if (
-                    isinstance(message, ToolMessage)
-                    and message.tool_call_id == tool_call_id
-                ):
-                    # Update the tool message with the result
-                    message.content = msg_content_output(proc2output(task))  # type: ignore
-                    break
+    for message in state.messages:
+        if not isinstance(message, ToolMessage):
+            continue
+        # Tasks of other conversations (e.g. concurrent batch threads) are skipped
+        task = pending_comm_tasks.get(message.tool_call_id)
+        if task is not None and task.done():
+            # Update the tool message with the result
+            message.content = msg_content_output(proc2output(task))  # type: ignore
             messages.append(message)
 
             # Remove the task from the pending list
-            del pending_comm_tasks[tool_call_id]
+            del pending_comm_tasks[message.tool_call_id]
 
     return {"messages": messages}
 
@@ -141,8 +258,24 @@ async def human_feedback(
 
     tool_call = response.tool_calls[0]
 
-    print("interrupting")
-    feedback = interrupt({"tool_call": tool_call["args"]})
+    # Approve without interrupting, so that the tool loop runs as one stream
+    configuration = Configuration.from_context()
+    policy = configuration.command_policy
+    if configuration.auto_approve or (
+        tool_call["name"] in READ_ONLY_TOOLS
+        and not denied_path(tool_call["args"].get("path", "."), policy)
+    ):
+        return Command(goto="tools", update={"feedback": "continue"})
+
+    if tool_call["name"] == "execute_command" and policy.auto_approve_read_only:
+        command = tool_call["args"].get("command", "")
+        decision = classify_command(command, policy)
+        if policy.log_decisions:
+            log_decision(command, decision)
+        if decision.read_only:
+            return Command(goto="tools", update={"feedback": "continue"})
+
+    feedback = interrupt({"tool_call": tool_call["args"], "name": tool_call["name"]})
 
     update = {"feedback": feedback}
 
@@ -158,25 +291,42 @@ async def human_feedback(
         return Command(goto="handle_pending_tasks", update=update)
 
 
-# Define a new graph
-builder = StateGraph(State, input=InputState, config_schema=Configuration)
+def build_graph(
+    tools: Sequence[Any] = TOOLS,
+    checkpointer: BaseCheckpointSaver[Any] | None = None,
+    model_factory: ModelFactory = load_chat_model,
+) -> CompiledStateGraph[Any, Any, Any, Any]:
+    """Build the agent graph.
+
+    Args:
+        tools (Sequence): Tools run by the `tools` node. The model is always bound
+            to `TOOLS`, so replacements must have the same names and arguments.
+        checkpointer (BaseCheckpointSaver): Checkpointer of the conversations.
+        model_factory (ModelFactory): Returns the chat model of a configuration,
+            e.g. a fake model to replay a recorded session.
+    """
+    builder = StateGraph(State, input=InputState, config_schema=Configuration)
+
+    # Define the two nodes we will cycle between
+    builder.add_node(
+        "call_model", functools.partial(call_model, load_model=model_factory)
+    )
+    builder.add_node("tools", ToolNode(tools))
+    builder.add_node(human_feedback)
+    builder.add_node(handle_pending_tasks)
 
-# Define the two nodes we will cycle between
-builder.add_node(call_model)
-builder.add_node("tools", ToolNode(TOOLS))
-builder.add_node(human_feedback)
-builder.add_node(handle_pending_tasks)
+    # Set the entrypoint as `call_model`
+    # This means that this node is the first one called
+    builder.add_edge("__start__", "handle_pending_tasks")
+    builder.add_edge("handle_pending_tasks", "call_model")
+    builder.add_edge("call_model", "human_feedback")
 
-# Set the entrypoint as `call_model`
-# This means that this node is the first one called
-builder.add_edge("__start__", "handle_pending_tasks")
-builder.add_edge("handle_pending_tasks", "call_model")
-builder.add_edge("call_model", "human_feedback")
+    # Add a normal edge from `tools` to `call_model`
+    # This creates a cycle: after using tools, we always return to the model
+    builder.add_edge("tools", "handle_pending_tasks")
 
+    # Compile the builder into an executable graph
+    return builder.compile(name="hi", checkpointer=checkpointer)
 
-# Add a normal edge from `tools` to `call_model`
-# This creates a cycle: after using tools, we always return to the model
-builder.add_edge("tools", "handle_pending_tasks")
 
-# Compile the builder into an executable graph
-graph = builder.compile(name="hi", checkpointer=InMemorySaver())
+graph = build_graph(TOOLS, InMemorySaver())
@@ -0,0 +1,219 @@
+"""Resource limits and usage accounting for the commands run by the agent.
+
+Commands are started by a minimal Python process in its own process group, so
+that the whole group can be killed. Like a shell running a foreground job, it
+makes the group the foreground group of the controlling terminal while the
+command runs, so that password prompts (`sudo`, `ssh`, git credentials) still
+work. It forks the shell, sets the configured limits with `setrlimit` in the
+child (so that they apply to the command and all its children), reaps it with
+`wait4` and reports its exit status and resource usage over a pipe. The shell is
+not started directly from `hi`, as Linux would count the resident memory of `hi`
+itself in the shell's maximum RSS.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from dataclasses import dataclass
+
+from hi.graph.configuration import ResourceLimits
+
+KILL_GRACE_SECONDS = 2.0
+"""Time between SIGTERM and SIGKILL when killing a command."""
+
+_RUNNER = """
+import json, os, resource, signal, sys, time
+fd = int(sys.argv[1])
+args = sys.argv[2:]
+split = args.index("--")
+# Keep running when the process group is terminated or interrupted, to report
+# the usage, and take the terminal from the background
+for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGTTOU):
+    signal.signal(sig, signal.SIG_IGN)
+tty, foreground = None, None
+try:
+    tty = os.open("/dev/tty", os.O_RDWR)
+    if os.tcgetpgrp(tty) == os.getpgid(os.getppid()):
+        foreground = os.tcgetpgrp(tty)
+        os.tcsetpgrp(tty, os.getpgrp())
+except OSError:
+    pass
+start = time.monotonic()
+pid = os.fork()
+if pid == 0:
+    try:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGTTOU):
+            signal.signal(sig, signal.SIG_DFL)
+        os.close(fd)
+        if tty is not None:
+            os.close(tty)
+        for limit in args[:split]:
+            name, value = limit.split("=")
+            resource_id = getattr(resource, name)
+            _, hard = resource.getrlimit(resource_id)
+            soft = int(value) if hard == resource.RLIM_INFINITY else min(int(value), hard)
+            # SIGXCPU at the soft CPU limit, SIGKILL one second later
+            new_hard = soft + 1 if name == "RLIMIT_CPU" else soft
+            if hard != resource.RLIM_INFINITY:
+                new_hard = min(new_hard, hard)
+            resource.setrlimit(resource_id, (soft, new_hard))
+        os.execv(args[split + 1], args[split + 1 :])
+    finally:
+        os._exit(127)
+_, status, rusage = os.wait4(pid, 0)
+if foreground is not None:
+    try:
+        os.tcsetpgrp(tty, foreground)
+    except OSError:
+        pass
+os.write(fd, json.dumps({
+    "code": os.waitstatus_to_exitcode(status),
+    "wall_seconds": time.monotonic() - start,
+    "cpu_seconds": rusage.ru_utime + rusage.ru_stime,
+    "max_rss_kb": rusage.ru_maxrss / (1024 if sys.platform == "darwin" else 1),
+}).encode())
+"""
+
+_SIGNAL_REASONS = {
+    signal.SIGXCPU: "CPU time limit exceeded.",
+    signal.SIGXFSZ: "File size limit exceeded.",
+}
+
+
+@dataclass
+class CommandResult:
+    """Output, exit code and resource usage of a finished command."""
+
+    stdout: bytes
+    stderr: bytes
+    code: int | None
+    """Exit code, or the negated signal number if the command was killed."""
+    wall_seconds: float
+    cpu_seconds: float | None = None
+    max_rss_mb: float | None = None
+    error: str | None = None
+    """Why the command was killed, if it was."""
+
+    def usage(self) -> dict[str, float]:
+        """Return the measured resource usage, rounded for display."""
+        usage = {"wall_seconds": round(self.wall_seconds, 3)}
+        if self.cpu_seconds is not None:
+            usage["cpu_seconds"] = round(self.cpu_seconds, 3)
+        if self.max_rss_mb is not None:
+            usage["max_rss_mb"] = round(self.max_rss_mb, 1)
+        return usage
+
+
+def _rlimits(limits: ResourceLimits) -> list[str]:
+    """Return the `setrlimit` arguments of the configured limits."""
+    mb = 1024 * 1024
+    values = {
+        "RLIMIT_CPU": limits.cpu_seconds,
+        "RLIMIT_AS": limits.memory_mb and limits.memory_mb * mb,
+        "RLIMIT_FSIZE": limits.file_size_mb and limits.file_size_mb * mb,
+        "RLIMIT_NPROC": limits.processes,
+    }
+    return [f"{name}={int(value)}" for name, value in values.items() if value]
+
+
+def _killpg(pid: int, sig: int) -> None:
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _reclaim_terminal(pgid: int) -> None:
+    """Take the terminal back from a killed command that was in the foreground."""
+    try:
+        tty = os.open("/dev/tty", os.O_RDWR)
+    except OSError:
+        return
+    try:
+        if os.tcgetpgrp(tty) == pgid:
+            # Changing the foreground group from the background raises SIGTTOU
+            mask = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTTOU})
+            try:
+                os.tcsetpgrp(tty, os.getpgrp())
+            finally:
+                signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+    except OSError:
+        pass
+    finally:
+        os.close(tty)
+
+
+async def run_command(command: str, limits: ResourceLimits) -> CommandResult:
+    """Run a shell command with resource limits and measure its usage."""
+    read_fd, write_fd = os.pipe()
+    start = time.monotonic()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-I",
+            "-S",
+            "-c",
+            _RUNNER,
+            str(write_fd),
+            *_rlimits(limits),
+            "--",
+            "/bin/sh",
+            "-c",
+            command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            process_group=0,
+            pass_fds=(write_fd,),
+        )
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+
+    # Children left in the background may keep the pipes open after the command
+    # exits, so they are waited for and killed with it
+    communicate = asyncio.ensure_future(proc.communicate())
+    error = None
+    try:
+        await asyncio.wait_for(asyncio.shield(communicate), limits.kill_after)
+    except TimeoutError:
+        error = f"Killed after {limits.kill_after:g} seconds."
+        _killpg(proc.pid, signal.SIGTERM)
+        done, _ = await asyncio.wait([communicate], timeout=KILL_GRACE_SECONDS)
+        if not done:
+            _killpg(proc.pid, signal.SIGKILL)
+            _reclaim_terminal(proc.pid)
+    except asyncio.CancelledError:
+        # Nobody waits for the result anymore, e.g. the batch item has finished
+        _killpg(proc.pid, signal.SIGKILL)
+        _reclaim_terminal(proc.pid)
+        os.close(read_fd)
+        raise
+    stdout, stderr = await communicate
+
+    with os.fdopen(read_fd, "rb") as report_file:
+        report = report_file.read()
+    if not report:
+        # The runner itself was killed, only the wall time is known
+        return CommandResult(
+            stdout, stderr, proc.returncode, time.monotonic() - start, error=error
+        )
+
+    usage = json.loads(report)
+    code = usage["code"]
+    # A signal kills the command itself, or the shell reports it as 128 + N
+    if error is None:
+        error = _SIGNAL_REASONS.get(-code if code < 0 else code - 128)
+    return CommandResult(
+        stdout=stdout,
+        stderr=stderr,
+        code=code,
+        wall_seconds=usage["wall_seconds"],
+        cpu_seconds=usage["cpu_seconds"],
+        max_rss_mb=usage["max_rss_kb"] / 1024,
+        error=error,
+    )
@@ -0,0 +1,767 @@
+"""Read-only command classification for auto-approval.
+
+Shell commands are parsed into simple commands, including the ones in pipelines,
+lists, subshells and command substitutions. A command line is read-only when
+every simple command in it is a known read-only program (or subcommand) used
+without writing flags, and every output redirection goes to `/dev/null`,
+`/dev/stdout` or `/dev/stderr`. Anything the parser does not understand is
+classified as mutating, so that it still goes through confirmation.
+"""
+
+import fnmatch
+import glob
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Sequence
+
+from hi.graph.configuration import CommandPolicy
+
+DEFAULT_POLICY_LOG_PATH = Path("~/.config/hi/policy.jsonl").expanduser().resolve()
+
+READ_ONLY_COMMANDS = {
+    ":", "[", "[[", "basename", "cal", "cat", "cd", "cmp", "column", "comm", "cut",
+    "df", "diff", "dirname", "du", "echo", "egrep", "expand", "false", "fgrep",
+    "file", "fold", "free", "getconf", "grep", "groups", "head", "hexdump", "id",
+    "journalctl", "jq", "join", "locale", "ls", "lsblk", "lscpu", "lsof", "md5sum",
+    "nl", "nproc", "od", "paste", "pgrep", "popd", "printf", "ps",
+    "pushd", "pwd", "readlink", "realpath", "rev", "rg", "seq", "sha1sum",
+    "sha256sum", "sha512sum", "sleep", "sort", "ss", "stat", "strings", "tac",
+    "tail", "test", "tr", "tree", "true", "type", "uname", "unexpand", "uniq",
+    "uptime", "w", "wc", "whereis", "which", "who", "whoami",
+}  # fmt: skip
+"""Programs that never write files, as long as their output is not redirected."""
+
+READ_ONLY_SUBCOMMANDS = {
+    "apt": {"list", "search", "show", "policy"},
+    "brew": {"info", "list", "search", "config", "doctor"},
+    "cargo": {"metadata", "tree", "version"},
+    "conda": {"info", "list"},
+    "docker": {"images", "info", "inspect", "logs", "ps", "version"},
+    "git": {
+        "blame", "branch", "cat-file", "config", "describe", "diff", "grep", "log",
+        "ls-files", "ls-remote", "ls-tree", "reflog", "remote", "rev-list",
+        "rev-parse", "shortlog", "show", "stash", "status", "tag", "version",
+    },
+    "go": {"env", "list", "version"},
+    "kubectl": {"describe", "explain", "get", "logs", "top", "version"},
+    "npm": {"list", "ls", "outdated", "view"},
+    "pip": {"freeze", "list", "show"},
+    "pip3": {"freeze", "list", "show"},
+    "systemctl": {"is-active", "is-enabled", "list-units", "show", "status"},
+}  # fmt: skip
+"""Programs whose listed subcommands are read-only."""
+
+_SYSTEM_BIN_DIRS = {
+    "/bin", "/sbin", "/usr/bin", "/usr/sbin", "/usr/local/bin", "/usr/local/sbin",
+    "/opt/homebrew/bin",
+}  # fmt: skip
+"""Directories of the programs that may be named by their path."""
+_SAFE_VARIABLES = re.compile(r"LANG|LC_\w+|TZ|COLUMNS|LINES|NO_COLOR|TERM")
+_LOOP_VARIABLE = re.compile(r"[a-z][a-z0-9]*")
+_ASSIGNMENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*=")
+_SAFE_REDIRECT_TARGETS = {"/dev/null", "/dev/stdout", "/dev/stderr"}
+_INPUT_REDIRECTS = {"<", "<<<", "<&"}
+_OUTPUT_REDIRECTS = {">", ">>", ">|", "&>", "&>>", "<>", ">&"}
+_CONTROL_OPERATORS = {"&&", "||", ";;", "|&", "|", "&", ";", "(", ")", "\n"}
+_OPERATORS = sorted(
+    _INPUT_REDIRECTS | _OUTPUT_REDIRECTS | _CONTROL_OPERATORS | {"<<", "<<-"},
+    key=len,
+    reverse=True,
+)
+_KEYWORDS = {"!", "{", "}", "if", "then", "else", "elif", "fi", "do", "done", "while", "until", "time"}  # fmt: skip
+_UNSUPPORTED_KEYWORDS = {"case", "esac", "select", "function", "coproc"}
+
+_FIND_WRITE_FLAGS = {"-delete", "-exec", "-execdir", "-ok", "-okdir", "-fls", "-fprint", "-fprint0", "-fprintf"}  # fmt: skip
+_GIT_GLOBAL_OPTIONS_WITH_VALUE = {"-C", "--git-dir", "--work-tree", "--namespace"}
+_GIT_COMMAND_OPTIONS = ("--upload-pack", "--exec")
+"""Options of git subcommands that name a program to run."""
+_GIT_REF_WRITE_FLAGS = {
+    "branch": {
+        "-d", "-D", "-m", "-M", "-c", "-C", "-f", "-u", "--delete", "--move",
+        "--copy", "--force", "--set-upstream-to", "--unset-upstream",
+        "--edit-description",
+    },
+    "tag": {
+        "-d", "-f", "-a", "-s", "-u", "-m", "-F", "--delete", "--force",
+        "--annotate", "--sign", "--local-user", "--message", "--file",
+    },
+}  # fmt: skip
+_JOURNALCTL_WRITE_FLAGS = ("--vacuum", "--rotate", "--flush", "--sync", "--relinquish", "--setup-keys", "--update-catalog")  # fmt: skip
+_SED_FILE_COMMANDS = set("rRwWe")
+"""sed commands that read or write files, or run commands."""
+_SED_COMMANDS = set("{}=dDgGhHnNpPxzF")
+_SED_NUMBER_COMMANDS = set("lLqQ")
+_SED_TEXT_COMMANDS = set("aic")
+_SED_LABEL_COMMANDS = set(":btTv")
+_SED_ADDRESS = re.compile(r"\$|\d+(~\d+)?")
+_SED_ADDRESS_OFFSET = re.compile(r"[+~]\d+")
+_SED_S_FLAGS = re.compile(r"[gpiImM0-9]*")
+_OPTION_CHECKS = {
+    "file": ("C", "--compile", "compiles magic files"),
+    "printf": ("v", None, "assigns a shell variable"),
+    "rg": (None, "--pre", "runs a preprocessor command"),
+    "sort": ("o", "--output", "writes files"),
+    "ss": ("K", "--kill", "closes sockets"),
+    "tree": ("o", None, "writes files"),
+}
+"""Options that make a read-only program write or run something, by program.
+
+Each entry is a short option letter, a long option and what the option does.
+"""
+
+
+class ParseError(ValueError):
+    """Raised when a command line cannot be parsed."""
+
+    pass
+
+
+@dataclass
+class Decision:
+    """The classification of a command line."""
+
+    read_only: bool
+    reason: str
+
+
+@dataclass
+class _Word:
+    text: str
+    dynamic: bool = False
+    """Whether the word contains parameter expansions or command substitutions."""
+
+
+@dataclass
+class _SimpleCommand:
+    words: list[_Word] = field(default_factory=list)
+    redirects: list[tuple[str, _Word]] = field(default_factory=list)
+
+
+def _matching(command: str, start: int, opening: str, closing: str) -> int:
+    """Return the index of the delimiter closing the one before `start`."""
+    depth = 1
+    i = start
+    while i < len(command):
+        c = command[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "'":
+            i = command.find("'", i + 1)
+            if i < 0:
+                break
+        elif c == '"':
+            i = _end_of_double_quotes(command, i + 1, [])
+            continue
+        elif c == opening:
+            depth += 1
+        elif c == closing:
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise ParseError(f"Missing '{closing}'.")
+
+
+def _skip_expansion(command: str, i: int, substitutions: list[str]) -> int:
+    """Skip the expansion starting with `$` or a backtick at `i`."""
+    if command[i] == "`":
+        end = i + 1
+        while end < len(command) and command[end] != "`":
+            end += 2 if command[end] == "\\" else 1
+        if end >= len(command):
+            raise ParseError("Missing '`'.")
+        substitutions.append(command[i + 1 : end])
+        return end + 1
+    if command.startswith("$((", i):
+        # Arithmetic, which may contain substitutions
+        end = _matching(command, i + 2, "(", ")")
+        _tokenize(command[i + 3 : end - 1], substitutions)
+        return end + 1
+    if command.startswith("$(", i):
+        end = _matching(command, i + 2, "(", ")")
+        substitutions.append(command[i + 2 : end])
+        return end + 1
+    if command.startswith("${", i):
+        # Parameter expansion, whose default value may contain substitutions
+        end = _matching(command, i + 2, "{", "}")
+        _tokenize(command[i + 2 : end], substitutions)
+        return end + 1
+    match = re.match(r"\$([A-Za-z_][A-Za-z0-9_]*|[0-9@*#?$!-])", command[i:])
+    return i + (match.end() if match else 1)
+
+
+def _end_of_double_quotes(command: str, i: int, substitutions: list[str]) -> int:
+    """Return the index after the double-quoted string whose content starts at `i`."""
+    while i < len(command):
+        c = command[i]
+        if c == "\\":
+            i += 2
+        elif c == '"':
+            return i + 1
+        elif c in "$`":
+            i = _skip_expansion(command, i, substitutions)
+        else:
+            i += 1
+    raise ParseError("Missing '\"'.")
+
+
+def _tokenize(command: str, substitutions: list[str]) -> list[_Word | str]:
+    """Split a command line into words and operators.
+
+    Command substitutions are appended to `substitutions` to be classified on
+    their own.
+    """
+    tokens: list[_Word | str] = []
+    word: _Word | None = None
+    i = 0
+    while i < len(command):
+        c = command[i]
+        if c in " \t":
+            word = None
+            i += 1
+            continue
+        if c == "#" and word is None:
+            end = command.find("\n", i)
+            i = len(command) if end < 0 else end
+            continue
+        if c in "<>" and command.startswith("(", i + 1):
+            end = _matching(command, i + 2, "(", ")")
+            substitutions.append(command[i + 2 : end])
+            if word is None:
+                word = _Word("")
+                tokens.append(word)
+            word.dynamic = True
+            i = end + 1
+            continue
+
+        operator = next((op for op in _OPERATORS if command.startswith(op, i)), None)
+        if operator:
+            if operator in ("<<", "<<-"):
+                raise ParseError("Here-documents are not supported.")
+            # A file descriptor number belongs to the redirection, e.g. `2>`
+            if (
+                operator not in _CONTROL_OPERATORS
+                and word is not None
+                and word.text.isdigit()
+                and tokens[-1] is word
+            ):
+                tokens.pop()
+            tokens.append(operator)
+            word = None
+            i += len(operator)
+            continue
+
+        if word is None:
+            word = _Word("")
+            tokens.append(word)
+        if c == "\\":
+            if command.startswith("\n", i + 1):
+                word = None if not word.text else word
+            else:
+                word.text += command[i + 1 : i + 2]
+            i += 2
+        elif c == "'":
+            end = command.find("'", i + 1)
+            if end < 0:
+                raise ParseError('Missing "\'".')
+            word.text += command[i + 1 : end]
+            i = end + 1
+        elif c == '"':
+            end = _end_of_double_quotes(command, i + 1, substitutions)
+            text = command[i + 1 : end - 1]
+            word.text += re.sub(r"\\([$`\"\\])", r"\1", text)
+            word.dynamic = word.dynamic or bool(re.search(r"(?<!\\)[$`]", text))
+            i = end
+        elif c == "$" and command.startswith(("'", '"'), i + 1):
+            # Decoded by bash only, e.g. `$'\x2ddelete'`
+            raise ParseError("$'...' and $\"...\" quoting is not supported.")
+        elif c in "$`":
+            end = _skip_expansion(command, i, substitutions)
+            word.text += command[i:end]
+            word.dynamic = word.dynamic or end - i > 1
+            i = end
+        else:
+            word.text += c
+            i += 1
+    return tokens
+
+
+def _simple_commands(tokens: list[_Word | str]) -> list[_SimpleCommand]:
+    commands = [_SimpleCommand()]
+    tokens = list(tokens)
+    while tokens:
+        token = tokens.pop(0)
+        if isinstance(token, _Word):
+            commands[-1].words.append(token)
+        elif token in _CONTROL_OPERATORS:
+            commands.append(_SimpleCommand())
+        else:
+            if not tokens or not isinstance(tokens[0], _Word):
+                raise ParseError(f"Missing target of '{token}'.")
+            target = tokens.pop(0)
+            assert isinstance(target, _Word)
+            commands[-1].redirects.append((token, target))
+    return [command for command in commands if command.words or command.redirects]
+
+
+def _rule_matches(words: Sequence[str], rules: list[str]) -> str | None:
+    for rule in rules:
+        rule_words = rule.split()
+        if list(words[: len(rule_words)]) == rule_words:
+            return rule
+    return None
+
+
+def _positionals(args: Sequence[str]) -> list[str]:
+    return [arg for arg in args if not arg.startswith("-")]
+
+
+def _has_short_option(args: Sequence[str], letter: str) -> bool:
+    """Return whether an option letter is given, alone or grouped like `-uo`."""
+    return any(
+        re.match(rf"-[a-zA-Z0-9]*{letter}", arg) and not arg.startswith("--")
+        for arg in args
+    )
+
+
+def _has_long_option(args: Sequence[str], option: str) -> bool:
+    """Return whether a long option is given, possibly abbreviated or with `=`."""
+    return any(
+        len(name) > 2 and option.startswith(name)
+        for name in (arg.split("=")[0] for arg in args if arg.startswith("--"))
+    )
+
+
+def _is_safe_variable(name: str) -> bool:
+    return bool(_SAFE_VARIABLES.fullmatch(name))
+
+
+def _sed_scripts(args: Sequence[str]) -> list[str] | None:
+    """Return the scripts of a sed invocation, or None if they cannot be known."""
+    scripts = []
+    positionals = []
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg == "--":
+            positionals += args
+            break
+        if _has_long_option([arg], "--file") or re.match(r"-[nrEsuz]*f", arg):
+            return None  # The script is read from a file
+        if _has_long_option([arg], "--expression"):
+            if "=" in arg:
+                scripts.append(arg.split("=", 1)[1])
+            elif args:
+                scripts.append(args.pop(0))
+        elif match := re.match(r"-[nrEsuz]*e(.*)", arg):
+            if match.group(1):
+                scripts.append(match.group(1))
+            elif args:
+                scripts.append(args.pop(0))
+        elif arg in ("-l", "--line-length") and args:
+            args.pop(0)
+        elif not arg.startswith("-"):
+            positionals.append(arg)
+    # Without `-e`, the first operand is the script and the others are files
+    return scripts or positionals[:1]
+
+
+def _sed_delimited(script: str, i: int, delimiter: str) -> int:
+    """Return the index after the text at `i` ending with an unescaped delimiter."""
+    while i < len(script):
+        if script[i] == "\\":
+            i += 2
+        elif script[i] == delimiter:
+            return i + 1
+        else:
+            i += 1
+    raise ParseError(f"Missing '{delimiter}' in the sed script.")
+
+
+def _sed_address(script: str, i: int) -> int:
+    """Return the index after the sed address at `i`, or `i` if there is none."""
+    if script.startswith(("/", "\\"), i):
+        # Regular expression, e.g. `/re/` or `\|re|`, with optional flags
+        if script[i] == "\\":
+            i += 1
+        if i >= len(script) or script[i] == "\n":
+            raise ParseError("Missing the delimiter of a sed address.")
+        i = _sed_delimited(script, i + 1, script[i])
+        while script.startswith(("I", "M"), i):
+            i += 1
+        return i
+    match = _SED_ADDRESS.match(script, i)
+    return match.end() if match else i
+
+
+def _skip_blanks(text: str, i: int) -> int:
+    while text.startswith((" ", "\t"), i):
+        i += 1
+    return i
+
+
+def _sed_script_is_safe(script: str) -> bool:
+    """Return whether a sed script only writes to the standard output.
+
+    The script is parsed command by command, so that addresses and `s` commands
+    with any delimiter are recognized. Scripts that read or write files or run
+    commands, i.e. use `r`, `R`, `w`, `W` or `e`, or the `w` or `e` flags of `s`,
+    are not safe, and neither are scripts that cannot be parsed.
+    """
+    i = 0
+    try:
+        while i < len(script):
+            if script[i] in " \t\n;":
+                i += 1
+                continue
+            if script[i] == "#":
+                end = script.find("\n", i)
+                i = len(script) if end < 0 else end
+                continue
+
+            start = i
+            i = _skip_blanks(script, _sed_address(script, i))
+            if i > start and script.startswith(",", i):
+                i = _skip_blanks(script, i + 1)
+                match = _SED_ADDRESS_OFFSET.match(script, i)
+                i = match.end() if match else _sed_address(script, i)
+            i = _skip_blanks(script, i)
+            while script.startswith("!", i):
+                i = _skip_blanks(script, i + 1)
+            if i >= len(script):
+                return False
+
+            command = script[i]
+            i += 1
+            if command in _SED_FILE_COMMANDS:
+                return False
+            if command in _SED_COMMANDS:
+                continue
+            if command in _SED_NUMBER_COMMANDS:
+                while i < len(script) and (script[i].isdigit() or script[i] in " \t"):
+                    i += 1
+            elif command in _SED_TEXT_COMMANDS:
+                # Text up to the end of the line, which may be escaped
+                while i < len(script) and script[i] != "\n":
+                    i += 2 if script[i] == "\\" else 1
+            elif command in _SED_LABEL_COMMANDS:
+                while i < len(script) and script[i] not in ";\n":
+                    i += 1
+            elif command in ("s", "y"):
+                if i >= len(script) or script[i] in "\n\\":
+                    return False
+                delimiter = script[i]
+                i = _sed_delimited(script, i + 1, delimiter)
+                i = _sed_delimited(script, i, delimiter)
+                if command == "s":
+                    flags = _SED_S_FLAGS.match(script, i)
+                    i = flags.end() if flags else i
+                    if script.startswith(("w", "e"), i):
+                        return False
+            else:
+                return False
+    except ParseError:
+        return False
+    return True
+
+
+def _sets_clock(args: Sequence[str]) -> bool:
+    """Return whether a `date` invocation sets the system clock."""
+    options_with_value = {"-d", "-f", "-r", "--date", "--file", "--reference"}
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg.startswith("-I"):
+            continue  # ISO 8601 output, e.g. `-Iseconds`
+        if _has_short_option([arg], "s") or _has_long_option([arg], "--set"):
+            return True
+        if arg in options_with_value:
+            args = args[1:]
+        elif not arg.startswith(("-", "+")):
+            return True  # `date MMDDhhmm`
+    return False
+
+
+def _check_git(args: list[str]) -> str | None:
+    """Return why a git invocation is not read-only, if it is not."""
+    while args and args[0].startswith("-"):
+        option = args.pop(0)
+        if option.startswith(("-c", "--config-env", "--exec-path")):
+            return f"`git {option}` can run arbitrary programs"
+        if option in _GIT_GLOBAL_OPTIONS_WITH_VALUE and args:
+            args.pop(0)
+    if not args:
+        return None
+    subcommand, rest = args[0], args[1:]
+    if subcommand not in READ_ONLY_SUBCOMMANDS["git"]:
+        return f"`git {subcommand}` may modify the repository"
+    if any(_has_long_option(rest, option) for option in _GIT_COMMAND_OPTIONS) or (
+        subcommand == "ls-remote" and _has_short_option(rest, "u")
+    ):
+        return f"`git {subcommand}` runs the given upload-pack program"
+    if any(arg.startswith("--output") for arg in rest) or _has_long_option(
+        rest, "--ext-diff"
+    ):
+        return f"`git {subcommand}` writes files with these options"
+    if subcommand == "grep" and (
+        _has_short_option(rest, "O") or _has_long_option(rest, "--open-files-in-pager")
+    ):
+        return "`git grep -O` runs a pager command"
+    if subcommand in ("branch", "tag"):
+        write_flags = _GIT_REF_WRITE_FLAGS[subcommand]
+        if any(arg.split("=")[0] in write_flags for arg in rest):
+            return f"`git {subcommand}` modifies refs with these options"
+        if _positionals(rest) and not {"-l", "--list"} & set(rest):
+            return f"`git {subcommand}` with a name creates a ref"
+    if subcommand == "stash" and rest[:1] not in (["list"], ["show"]):
+        return "`git stash` modifies the stash"
+    if (
+        subcommand == "reflog"
+        and rest[:1] not in ([], ["show"])
+        and _positionals(rest[:1])
+    ):
+        return "`git reflog` modifies the reflog"
+    if subcommand == "remote" and _positionals(rest)[:1] not in (
+        [],
+        ["show"],
+        ["get-url"],
+    ):
+        return "`git remote` modifies remotes"
+    if subcommand == "config" and not {
+        "--get", "--get-all", "--get-regexp", "--list", "-l",
+    } & set(rest):  # fmt: skip
+        return "`git config` modifies the configuration"
+    return None
+
+
+def denied_path(path: str, policy: CommandPolicy) -> str | None:
+    """Return the `deny_paths` glob matching a path or one of its parents, if any.
+
+    Paths are made absolute, and matched again after resolving symbolic links, so
+    that `./.env`, `src/../.env` or a link to `.env` all match `.env`.
+    """
+    if not policy.deny_paths:
+        return None
+    expanded = os.path.expanduser(path)
+    candidates = {os.path.abspath(expanded), os.path.realpath(expanded)}
+    for rule in policy.deny_paths:
+        name_only = "/" not in rule.rstrip("/")
+        pattern = (
+            rule.rstrip("/") if name_only else os.path.abspath(os.path.expanduser(rule))
+        )
+        for candidate in candidates:
+            for part in (Path(candidate), *Path(candidate).parents):
+                if fnmatch.fnmatch(part.name if name_only else str(part), pattern):
+                    return rule
+    return None
+
+
+def _denied_argument(args: Sequence[str], policy: CommandPolicy) -> str | None:
+    """Return an argument that names a denied path, if any.
+
+    Variables like `$HOME` and globs like `~/.ss?/*` are expanded as the shell
+    would, as far as they can be.
+    """
+    for arg in args:
+        if arg.startswith("-"):
+            if "=" not in arg:
+                continue
+            arg = arg.split("=", 1)[1]
+        if not arg:
+            continue
+        path = os.path.expandvars(arg)
+        paths = [path, *glob.glob(os.path.expanduser(path))]
+        if any(denied_path(path, policy) for path in paths):
+            return arg
+    return None
+
+
+def _check_words(words: list[_Word], policy: CommandPolicy) -> str | None:
+    """Return why a simple command is not read-only, if it is not."""
+    words = list(words)
+    while words and words[0].text in _KEYWORDS and not words[0].dynamic:
+        words.pop(0)
+    if not words:
+        return None
+    if words[0].text == "for":
+        # Loop header, which only assigns the loop variable
+        if len(words) > 1 and not _LOOP_VARIABLE.fullmatch(words[1].text):
+            return f"the loop variable `{words[1].text}` may be used by programs"
+        return None
+    if words[0].text in _UNSUPPORTED_KEYWORDS:
+        return f"`{words[0].text}` is not supported by the classifier"
+
+    # Leading assignments affect the command, or every later command if alone
+    while words and _ASSIGNMENT.match(words[0].text):
+        name = words[0].text.split("=")[0]
+        if not _is_safe_variable(name):
+            return f"setting `{name}` may change what commands do"
+        words.pop(0)
+    if not words:
+        return None
+
+    if any(word.dynamic for word in words[:1]):
+        return "the program name is only known at run time"
+    args = [word.text for word in words]
+
+    if rule := _rule_matches(args, policy.deny):
+        return f"denied by rule `{rule}`"
+    if arg := _denied_argument(args[1:], policy):
+        return f"`{arg}` is a denied path"
+    if _rule_matches(args, policy.allow):
+        return None
+
+    if "/" in args[0] and os.path.dirname(args[0]) not in _SYSTEM_BIN_DIRS:
+        return f"`{args[0]}` is not a system program"
+    name, rest = Path(args[0]).name, args[1:]
+    if name in ("nice", "timeout", "command", "builtin", "env", "xargs"):
+        return _check_wrapper(name, words[1:], policy)
+    if name in READ_ONLY_SUBCOMMANDS:
+        if name == "git":
+            return _check_git(rest)
+        subcommand = next(iter(_positionals(rest)), None)
+        if subcommand not in READ_ONLY_SUBCOMMANDS[name]:
+            return (
+                f"`{name} {subcommand or ''}`".replace(" `", "`")
+                + " may modify the system"
+            )
+        if name == "go" and subcommand == "env" and _has_short_option(rest, "[wu]"):
+            return "`go env -w` modifies the go environment file"
+        return None
+    if name == "find":
+        if flag := next((arg for arg in rest if arg in _FIND_WRITE_FLAGS), None):
+            return f"`find {flag}` runs commands or writes files"
+        return None
+    if name == "export":
+        for arg in _positionals(rest):
+            variable = arg.split("=")[0]
+            if not _is_safe_variable(variable):
+                return f"exporting `{variable}` may change what later commands do"
+        return None
+    if name in _OPTION_CHECKS:
+        letter, option, effect = _OPTION_CHECKS[name]
+        if (letter and _has_short_option(rest, letter)) or (
+            option and _has_long_option(rest, option)
+        ):
+            return f"`{name} {f'-{letter}' if letter else option}` {effect}"
+    if name == "sort" and _has_long_option(rest, "--compress-program"):
+        return "`sort --compress-program` runs a command"
+    if name == "tree" and _has_short_option(rest, "R"):
+        return "`tree -R` writes files in every directory"
+    if name == "ss" and (
+        _has_short_option(rest, "D") or _has_long_option(rest, "--diag")
+    ):
+        return "`ss -D` writes files"
+    if name == "date":
+        return "`date` sets the system clock" if _sets_clock(rest) else None
+    if name == "hostname":
+        if (
+            _positionals(rest)
+            or _has_short_option(rest, "[Fb]")
+            or any(_has_long_option(rest, option) for option in ("--file", "--boot"))
+        ):
+            return "`hostname` sets the host name"
+        return None
+    if name == "sed":
+        if _has_long_option(rest, "--in-place") or _has_short_option(rest, "i"):
+            return "`sed -i` edits files in place"
+        scripts = _sed_scripts(rest)
+        if scripts is None:
+            return "the sed script file is not checked"
+        if not all(_sed_script_is_safe(script) for script in scripts):
+            return "the sed script may write files or run commands"
+        return None
+    if name == "journalctl":
+        if flag := next(
+            (arg for arg in rest if arg.startswith(_JOURNALCTL_WRITE_FLAGS)), None
+        ):
+            return f"`journalctl {flag}` modifies the journal"
+        return None
+    if name in ("uniq", "xxd") and len(_positionals(rest)) > 1:
+        return f"`{name}` writes its second file argument"
+    if name in READ_ONLY_COMMANDS:
+        return None
+    return f"`{name}` is not known to be read-only"
+
+
+def _check_wrapper(name: str, words: list[_Word], policy: CommandPolicy) -> str | None:
+    """Check a program that runs another command, e.g. `xargs` or `timeout`."""
+    args = [word.text for word in words]
+    if name == "command" and args[:1] in (["-v"], ["-V"]):
+        return None  # Only looks up the command
+
+    # Skip the options of the wrapper, and their values
+    options_with_value = {
+        "nice": {"-n", "--adjustment"},
+        "timeout": {"-s", "--signal", "-k", "--kill-after"},
+        # `-e`, `-i` and `-l` only take attached values, e.g. `-i{}`
+        "xargs": {
+            "-n", "-I", "-d", "-P", "-L", "-s", "-E", "-a", "--max-args",
+            "--max-procs", "--max-chars", "--delimiter", "--arg-file",
+            "--process-slot-var",
+        },
+    }.get(name, set())  # fmt: skip
+    i = 0
+    while i < len(args) and args[i].startswith("-"):
+        i += 2 if args[i] in options_with_value else 1
+    if name == "timeout":
+        i += 1  # Duration
+    if name == "env" and i >= len(args):
+        return "`env` prints environment variables, which may hold secrets"
+    if name == "xargs" and i >= len(args):
+        return None  # Defaults to `echo`
+    return _check_words(words[i:], policy) if i < len(args) else None
+
+
+def classify_command(command: str, policy: CommandPolicy | None = None) -> Decision:
+    """Classify a shell command line as read-only or mutating.
+
+    Args:
+        command: The command line, as passed to `sh -c`.
+        policy: Extra allow and deny rules.
+    """
+    policy = policy or CommandPolicy()
+    sources = [command]
+    while sources:
+        source = sources.pop()
+        substitutions: list[str] = []
+        try:
+            commands = _simple_commands(_tokenize(source, substitutions))
+        except ParseError as e:
+            return Decision(False, f"cannot parse command: {e}")
+        sources.extend(substitutions)
+
+        for simple_command in commands:
+            for operator, target in simple_command.redirects:
+                if operator in _INPUT_REDIRECTS:
+                    if denied_path(target.text, policy):
+                        return Decision(False, f"`{target.text}` is a denied path")
+                    continue
+                if operator == ">&" and re.fullmatch(r"\d+|-", target.text):
+                    continue  # Duplicates a file descriptor
+                if target.dynamic or target.text not in _SAFE_REDIRECT_TARGETS:
+                    return Decision(False, f"writes to `{target.text}`")
+            if reason := _check_words(simple_command.words, policy):
+                return Decision(False, reason)
+
+    return Decision(True, "all commands are read-only")
+
+
+def log_decision(
+    command: str, decision: Decision, path: Path = DEFAULT_POLICY_LOG_PATH
+) -> None:
+    """Append a classification decision to the policy log."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    record = {
+        "time": time.time(),
+        "command": command,
+        "read_only": decision.read_only,
+        "reason": decision.reason,
+    }
+    with open(path, "a") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -0,0 +1,347 @@
+"""Rate limiting shared by all `hi` processes.
+
+Several `hi` processes often use the same provider key at once, e.g. in
+different tmux panes or next to a batch run. The `SharedRateLimiter` keeps one
+token bucket per provider key in a SQLite database, whose file lock serializes
+the updates of all processes.
+
+Interactive requests have priority: while an interactive request is waiting for
+a token, background requests (batch mode) do not take any. When the provider
+still answers with HTTP 429, the refill rate of the bucket is reduced and no
+request is sent until the backoff period ends. The rate recovers gradually as
+requests succeed.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Literal, TypeVar
+
+from langchain_core.rate_limiters import BaseRateLimiter
+from langchain_core.runnables import Runnable
+
+DEFAULT_RATE_LIMIT_DB_PATH = Path("~/.config/hi/ratelimit.sqlite").expanduser()
+
+T = TypeVar("T")
+
+Priority = Literal["interactive", "background"]
+
+request_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "request_priority", default="interactive"
+)
+"""Priority of the model requests made in the current context."""
+
+MIN_RATE_FACTOR = 1 / 16
+"""Lowest fraction of the configured rate after repeated 429 responses."""
+
+RECOVERY_FACTOR = 1.25
+"""Growth of the rate factor after each successful request."""
+
+MAX_BACKOFF_SECONDS = 60.0
+
+_MAX_POLL_SECONDS = 1.0
+
+_WAITER_TTL = 30.0
+"""Waiters not seen for this long are considered gone, e.g. killed processes."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    rate_factor REAL NOT NULL DEFAULT 1,
+    backoff_until REAL NOT NULL DEFAULT 0,
+    throttles INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS waiters (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    seen REAL NOT NULL
+);
+"""
+
+
+def bucket_key(provider: str, base_url: str | None, api_key: str | None) -> str:
+    """Return the bucket of a provider key. Keys are hashed, never stored."""
+    digest = hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+    return f"{provider}|{base_url or ''}|{digest}"
+
+
+def _status_code(error: BaseException) -> int | None:
+    status = getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Check whether a provider error is an HTTP 429 response."""
+    return _status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Check whether a provider error is worth retrying, other than a 429 response.
+
+    These are the errors the provider clients retry themselves, which they do not
+    when a `SharedRateLimiter` is used.
+    """
+    status = _status_code(error)
+    return (status is not None and (status in (408, 409) or status >= 500)) or type(
+        error
+    ).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after(error: BaseException) -> float | None:
+    """Return the delay requested by the `Retry-After` header of a 429 response."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SharedRateLimiter(BaseRateLimiter):
+    """Token bucket rate limiter shared across processes through SQLite."""
+
+    def __init__(
+        self,
+        key: str,
+        requests_per_second: float,
+        max_bucket_size: float = 1,
+        check_every_n_seconds: float = 0.1,
+        path: Path = DEFAULT_RATE_LIMIT_DB_PATH,
+    ) -> None:
+        """Initialize the limiter.
+
+        Args:
+            key (str): Bucket shared by all limiters with the same key.
+            requests_per_second (float): Refill rate of the bucket.
+            max_bucket_size (float): Maximum burst of requests.
+            check_every_n_seconds (float): Polling interval while waiting for
+                another process.
+            path (Path): Path of the SQLite database.
+        """
+        self.key = key
+        self.requests_per_second = requests_per_second
+        self.max_bucket_size = max(1.0, max_bucket_size)
+        self.check_every_n_seconds = check_every_n_seconds
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        # Transactions of concurrent requests run in worker threads, one at a time
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=10, isolation_level=None, check_same_thread=False
+            )
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def _try_acquire(self, waiter_id: str, priority: Priority) -> float:
+        """Take a token if possible.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the suggested wait in seconds.
+        """
+        with self._lock:
+            wait = self._try_acquire_locked(waiter_id, priority)
+        # Other processes change the bucket, so do not sleep too long at once
+        return min(wait, _MAX_POLL_SECONDS)
+
+    def _try_acquire_locked(self, waiter_id: str, priority: Priority) -> float:
+        connection = self._connect()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock, so that the read-modify-write
+        # of the bucket is atomic across processes
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated, rate_factor, backoff_until FROM buckets "
+                "WHERE key = ?",
+                (self.key,),
+            ).fetchone()
+            if row is None:
+                tokens, updated, rate_factor, backoff_until = (
+                    self.max_bucket_size,
+                    now,
+                    1.0,
+                    0.0,
+                )
+                connection.execute(
+                    "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                    (self.key, tokens, now),
+                )
+            else:
+                tokens, updated, rate_factor, backoff_until = row
+
+            rate = self.requests_per_second * rate_factor
+            tokens = min(self.max_bucket_size, tokens + (now - updated) * rate)
+            connection.execute(
+                "DELETE FROM waiters WHERE seen < ?", (now - _WAITER_TTL,)
+            )
+            blocked = (
+                priority == "background"
+                and connection.execute(
+                    "SELECT 1 FROM waiters WHERE key = ? AND id != ? LIMIT 1",
+                    (self.key, waiter_id),
+                ).fetchone()
+            )
+
+            if now < backoff_until:
+                wait = backoff_until - now
+            elif blocked:
+                wait = self.check_every_n_seconds
+            elif tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+
+            connection.execute(
+                "UPDATE buckets SET tokens = ?, updated = ? WHERE key = ?",
+                (tokens, now, self.key),
+            )
+            if priority == "interactive":
+                if wait:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO waiters (id, key, seen) VALUES (?, ?, ?)",
+                        (waiter_id, self.key, now),
+                    )
+                else:
+                    connection.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+    def _cancel(self, waiter_id: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        """Take a token, waiting for it if `blocking` is set."""
+        waiter_id = f"{os.getpid()}-{uuid.uuid4().hex}"
+        priority = request_priority.get()
+        try:
+            while wait := self._try_acquire(waiter_id, priority):
+                if not blocking:
+                    return False
+                time.sleep(wait)
+            return True
+        finally:
+            self._cancel(waiter_id)
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        """Take a token, waiting for it if `blocking` is set.
+
+        The database is accessed in a worker thread, since taking its lock may
+        block while other processes hold it.
+        """
+        waiter_id = f"{os.getpid()}-{uuid.uuid4().hex}"
+        priority = request_priority.get()
+        try:
+            while wait := await asyncio.to_thread(
+                self._try_acquire, waiter_id, priority
+            ):
+                if not blocking:
+                    return False
+                await asyncio.sleep(wait)
+            return True
+        finally:
+            await asyncio.to_thread(self._cancel, waiter_id)
+
+    def record_throttle(self, delay: float | None = None) -> None:
+        """Back off after a 429 response and reduce the refill rate.
+
+        Args:
+            delay (float): Delay requested by the provider, if any. Defaults to
+                an exponential backoff on consecutive 429 responses.
+        """
+        with self._lock:
+            self._record_throttle_locked(delay)
+
+    def _record_throttle_locked(self, delay: float | None) -> None:
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT rate_factor, throttles FROM buckets WHERE key = ?",
+                (self.key,),
+            ).fetchone()
+            rate_factor, throttles = row or (1.0, 0)
+            if delay is None:
+                delay = min(MAX_BACKOFF_SECONDS, 2.0**throttles)
+            connection.execute(
+                "INSERT INTO buckets (key, tokens, updated, rate_factor, "
+                "backoff_until, throttles) VALUES (?, 0, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = 0, updated = excluded.updated, "
+                "rate_factor = excluded.rate_factor, "
+                "backoff_until = excluded.backoff_until, throttles = excluded.throttles",
+                (
+                    self.key,
+                    now,
+                    max(MIN_RATE_FACTOR, rate_factor / 2),
+                    now + delay,
+                    throttles + 1,
+                ),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def record_success(self) -> None:
+        """Let the refill rate recover after a successful request."""
+        with self._lock:
+            self._connect().execute(
+                "UPDATE buckets SET throttles = 0, "
+                "rate_factor = MIN(1.0, rate_factor * ?) WHERE key = ?",
+                (RECOVERY_FACTOR, self.key),
+            )
+
+
+async def ainvoke_with_backoff(
+    runnable: Runnable[Any, T],
+    input: Any,
+    limiter: BaseRateLimiter | None,
+    retries: int = 3,
+) -> T:
+    """Invoke a model, reporting 429 responses to a shared limiter and retrying.
+
+    The limiter waits out the backoff before the next attempt, so that the other
+    `hi` processes using the same key back off as well. Since the provider client
+    does not retry on its own, other transient errors are retried here too.
+    """
+    if not isinstance(limiter, SharedRateLimiter):
+        return await runnable.ainvoke(input)
+
+    for attempt in range(retries + 1):
+        try:
+            result = await runnable.ainvoke(input)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            if is_rate_limit_error(e):
+                await asyncio.to_thread(limiter.record_throttle, retry_after(e))
+            elif is_transient_error(e):
+                await asyncio.sleep(0.5 * 2**attempt)
+            else:
+                raise
+        else:
+            await asyncio.to_thread(limiter.record_success)
+            return result
+    raise AssertionError("unreachable")
@@ -0,0 +1,97 @@
+"""Serialization of tool results and pane content for the model.
+
+Tool results are kept as JSON in the graph state and rendered when the prompt is
+assembled, so that the format can be changed without touching the tools or the
+checkpoints. Two formats are supported:
+
+- verbose: tool results as JSON objects and pane content in XML tags.
+- compact: one `key: value` line per non-empty field, multi-line fields last
+  without escaping, and pane content under plain headings.
+"""
+
+import json
+from typing import Any, Literal
+
+Serialization = Literal["compact", "verbose"]
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _scalar(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def format_compact(output: dict[str, Any]) -> str:
+    """Format a tool output as `key: value` lines, skipping empty fields.
+
+    Nested objects are written as `key: name=value ...`, and multi-line strings as
+    a `key:` line followed by the raw text, after all other fields.
+    """
+    lines = []
+    blocks = []
+    for key, value in output.items():
+        if _is_empty(value):
+            continue
+        if isinstance(value, dict):
+            value = " ".join(
+                f"{name}={_scalar(item)}"
+                for name, item in value.items()
+                if not _is_empty(item)
+            )
+        if isinstance(value, str) and "\n" in value:
+            blocks.append(f"{key}:\n{value}")
+        else:
+            lines.append(f"{key}: {_scalar(value)}")
+    return "\n".join(lines + blocks)
+
+
+def format_tool_content(content: Any, serialization: Serialization) -> Any:
+    """Render the content of a tool message, stored as a JSON object."""
+    if serialization == "verbose" or not isinstance(content, str):
+        return content
+    try:
+        output = json.loads(content)
+    except json.JSONDecodeError:
+        return content
+    if not isinstance(output, dict):
+        return content
+    return format_compact(output)
+
+
+def format_panes(
+    pane_content: dict[str, str],
+    current_pane_id: str,
+    serialization: Serialization,
+    stdin: bool = False,
+) -> str:
+    """Render the selected pane content of the first message."""
+    current = pane_content.get(current_pane_id, "")
+    others = {
+        pane_id: content
+        for pane_id, content in pane_content.items()
+        if pane_id != current_pane_id
+    }
+
+    if serialization == "compact":
+        if stdin:
+            return f"## Piped input:\n{current}"
+        sections = [f"## Current tmux pane {current_pane_id}:\n{current}"]
+        sections += [
+            f"## Other pane {pane_id}:\n{content}"
+            for pane_id, content in others.items()
+            if content
+        ]
+        return "\n".join(sections)
+
+    if stdin:
+        return f"""## Piped input:
+<stdin>{current}</stdin>"""
+
+    other_pane_content = "\n".join(
+        f"<pane id='{pane_id}'>{content}</pane>" for pane_id, content in others.items()
+    )
+    return f"""## Current tmux window state:
+<current_pane>{current}</current_pane>
+<other_panes>{other_pane_content}</other_panes>"""
@@ -7,14 +7,16 @@ from langchain_core.messages import AnyMessage
 from langgraph.graph import add_messages
 from langgraph.managed import IsLastStep
 
+from hi.graph.usage import ModelUsage, Usage, add_model_usage, add_usage
+
 
 @dataclass
 class InputState:
     messages: Annotated[Sequence[AnyMessage], add_messages] = field(
         default_factory=list
     )
-    window_content: dict[str, list[str]] = field(default_factory=dict)
-    """Content of the current tmux window, indexed by pane ID."""
+    window_content: dict[str, str] = field(default_factory=dict)
+    """Digests of the current tmux window content in `BLOB_STORE`, indexed by pane ID."""
     current_pane_id: str = field(default="")
     """ID of the current tmux pane."""
 
@@ -23,20 +25,11 @@ class InputState:
 class State(InputState):
     is_last_step: IsLastStep = field(default=False)
 
-    pane_history: dict[str, list[str]] = field(default_factory=dict)
-    """History of captured pane outputs, indexed by pane ID."""
-
     feedback: str = field(default="")
     """Feedback from the user, if any."""
 
-    def get_current_pane_content(self) -> str:
-        """Get the content of the current pane."""
-        return "\n".join(self.window_content[self.current_pane_id])
-
-    def get_other_panes_content(self) -> dict[str, str]:
-        """Get the content of all other panes."""
-        return {
-            pane_id: "\n".join(content)
-            for pane_id, content in self.window_content.items()
-            if pane_id != self.current_pane_id
-        }
+    usage: Annotated[Usage, add_usage] = field(default_factory=dict)
+    """Token and cost usage accumulated over the session."""
+
+    model_usage: Annotated[ModelUsage, add_model_usage] = field(default_factory=dict)
+    """Usage accumulated over the session, indexed by model."""
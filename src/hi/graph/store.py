@@ -0,0 +1,126 @@
+"""Content-addressed store for large blobs such as pane captures and tool outputs.
+
+The graph state only holds the SHA-256 digests of large blobs, so that the
+checkpointer does not store a new copy of them on every step. Blobs are resolved
+when the prompt is assembled. Each blob is referenced by the sessions that stored
+it and evicted once the last of them is released.
+"""
+
+import hashlib
+import json
+from typing import Any, Mapping, Sequence
+
+from langgraph.config import get_config
+
+BLOB_THRESHOLD = 2048
+"""Tool output fields longer than this (in characters) are moved to the store."""
+
+BLOB_KEY = "$blob"
+"""Key of the JSON object that replaces a stored tool output field."""
+
+DEFAULT_SESSION = "default"
+
+
+class BlobStore:
+    """In-memory, reference-counted content-addressed blob store."""
+
+    def __init__(self) -> None:
+        """Initialize an empty store."""
+        self._blobs: dict[str, str] = {}
+        self._owners: dict[str, set[str]] = {}
+        self._sessions: dict[str, set[str]] = {}
+
+    def put(self, data: str, session_id: str = DEFAULT_SESSION) -> str:
+        """Store a blob on behalf of a session and return its digest."""
+        digest = hashlib.sha256(data.encode()).hexdigest()
+        self._blobs.setdefault(digest, data)
+        self._owners.setdefault(digest, set()).add(session_id)
+        self._sessions.setdefault(session_id, set()).add(digest)
+        return digest
+
+    def get(self, digest: str) -> str:
+        """Return the blob with the given digest."""
+        return self._blobs[digest]
+
+    def release(self, session_id: str) -> None:
+        """Drop the references of a session and evict unreferenced blobs."""
+        for digest in self._sessions.pop(session_id, set()):
+            owners = self._owners[digest]
+            owners.discard(session_id)
+            if not owners:
+                del self._owners[digest]
+                del self._blobs[digest]
+
+    def __contains__(self, digest: object) -> bool:
+        """Check whether a blob is stored."""
+        return digest in self._blobs
+
+    def __len__(self) -> int:
+        """Return the number of stored blobs."""
+        return len(self._blobs)
+
+
+BLOB_STORE = BlobStore()
+
+
+def current_session_id() -> str:
+    """Return the thread ID of the running graph, used as the blob owner."""
+    try:
+        configurable = get_config().get("configurable") or {}
+    except RuntimeError:
+        return DEFAULT_SESSION
+    return str(configurable.get("thread_id", DEFAULT_SESSION))
+
+
+def store_window_content(
+    window_content: Mapping[str, Sequence[str]], session_id: str
+) -> dict[str, str]:
+    """Store captured pane lines and return their digests indexed by pane ID."""
+    return {
+        pane_id: BLOB_STORE.put("\n".join(lines), session_id)
+        for pane_id, lines in window_content.items()
+    }
+
+
+def pane_lines(content: str | Sequence[str]) -> list[str]:
+    """Resolve the lines of a pane from its digest.
+
+    Raw lines are returned as is, so that the graph can still be invoked with
+    uncompressed window content.
+    """
+    if isinstance(content, str):
+        return BLOB_STORE.get(content).split("\n")
+    return list(content)
+
+
+def offload_fields(output: dict[str, Any], session_id: str) -> dict[str, Any]:
+    """Move long string fields of a tool output to the store."""
+    return {
+        key: {BLOB_KEY: BLOB_STORE.put(value, session_id)}
+        if isinstance(value, str) and len(value) > BLOB_THRESHOLD
+        else value
+        for key, value in output.items()
+    }
+
+
+def resolve_fields(output: dict[str, Any]) -> dict[str, Any]:
+    """Replace stored tool output fields by their content."""
+    return {
+        key: BLOB_STORE.get(value[BLOB_KEY])
+        if isinstance(value, dict) and BLOB_KEY in value
+        else value
+        for key, value in output.items()
+    }
+
+
+def resolve_content(content: Any) -> Any:
+    """Resolve stored fields of a JSON tool message content."""
+    if not isinstance(content, str) or BLOB_KEY not in content:
+        return content
+    try:
+        output = json.loads(content)
+    except json.JSONDecodeError:
+        return content
+    if not isinstance(output, dict):
+        return content
+    return json.dumps(resolve_fields(output), ensure_ascii=False)
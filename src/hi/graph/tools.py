@@ -1,18 +1,25 @@
 """Agent tools."""
 
 import asyncio
-from asyncio import subprocess
+import re
 from typing import Annotated, Any, Callable, List, Optional, cast
 
 from langchain_core.messages import AIMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.prebuilt import InjectedState
 
+from hi.context.watcher import Trigger, WatchError, get_watcher
 from hi.graph.configuration import Configuration
+from hi.graph.file_tools import list_directory, read_file, search_files
+from hi.graph.limits import CommandResult, run_command
 from hi.graph.state import State
+from hi.graph.store import current_session_id, offload_fields
 
 pending_comm_tasks = {}
 
+WATCH_OUTPUT_LINES = 50
+"""Number of recent pane lines returned by `watch_pane`."""
+
 
 async def execute_command(
     command: str,
@@ -32,15 +39,7 @@ async def execute_command(
 
     configuration = Configuration.from_context()
 
-    try:
-        proc = await subprocess.create_subprocess_shell(
-            command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-        )
-
-        comm_task = asyncio.create_task(proc.communicate())
-    except Exception as e:
-        return {"error": str(e), "code": proc.returncode}
-
+    comm_task = asyncio.create_task(run_command(command, configuration.command_limits))
     done, pending = await asyncio.wait(
         [comm_task], timeout=configuration.command_timeout
     )
@@ -55,20 +54,70 @@ async def execute_command(
         }
 
 
-def proc2output(comm_task: asyncio.Task) -> dict[str, Any]:
+def proc2output(comm_task: asyncio.Task[CommandResult]) -> dict[str, Any]:
     """Convert a completed command task to output format."""
     try:
-        stdout, stderr = comm_task.result()
+        result = comm_task.result()
     except Exception as e:
         return {
             "error": str(e),
         }
 
-    return {
-        "stdout": stdout.decode().strip(),
-        "stderr": stderr.decode().strip(),
-        "code": 0,
+    output: dict[str, Any] = {
+        "stdout": result.stdout.decode(errors="replace").strip(),
+        "stderr": result.stderr.decode(errors="replace").strip(),
+        "code": result.code,
+        "usage": result.usage(),
+    }
+    if result.error:
+        output["error"] = result.error
+    return offload_fields(output, current_session_id())
+
+
+async def watch_pane(
+    pane_id: str,
+    explanation: str,
+    pattern: str | None = None,
+    idle_seconds: float | None = None,
+    on_exit: bool = False,
+    timeout_seconds: float = 600,
+) -> dict[str, Any]:
+    """Wait for an event in another tmux pane, e.g. a build failing or finishing.
+
+    Returns as soon as any of the given triggers fires, with the recent output
+    of the pane. At least one trigger should be given.
+
+    Args:
+        pane_id (str): ID of the pane to watch, e.g. '%3'.
+        explanation (str): A brief explanation of what is being waited for.
+        pattern (str): Python regex; fires on the first new output line matching it.
+        idle_seconds (float): Fires when the pane produced no output for this many seconds.
+        on_exit (bool): Fires when the process running in the pane exits.
+        timeout_seconds (float): Give up after this many seconds.
+    """
+    try:
+        trigger = Trigger(
+            pattern=re.compile(pattern) if pattern else None,
+            idle_seconds=idle_seconds,
+            on_exit=on_exit,
+        )
+        watcher = await get_watcher(pane_id)
+        event = await watcher.wait(pane_id, trigger, timeout_seconds)
+    except (re.error, WatchError) as e:
+        return {"error": str(e)}
+
+    output = {
+        "trigger": event.trigger,
+        "line": event.line,
+        "output": "\n".join(watcher.buffers[pane_id].tail(WATCH_OUTPUT_LINES)),
     }
+    return offload_fields(output, current_session_id())
 
 
-TOOLS: List[Callable[..., Any]] = [execute_command]
+TOOLS: List[Callable[..., Any]] = [
+    execute_command,
+    watch_pane,
+    read_file,
+    search_files,
+    list_directory,
+]
@@ -0,0 +1,138 @@
+"""Token and cost accounting.
+
+Usage is tracked as plain dicts with the keys of `USAGE_KEYS`, so that it can be
+accumulated in the graph state with `add_usage` and written to the usage log as is.
+The state also keeps the usage of each model, since a session may switch models.
+"""
+
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Iterable
+
+from langchain_core.messages import AIMessage
+
+from hi.graph.configuration import BudgetConfig, ModelPrices
+
+DEFAULT_USAGE_LOG_PATH = Path("~/.config/hi/usage.jsonl").expanduser().resolve()
+
+USAGE_KEYS = ("input_tokens", "output_tokens", "cached_tokens", "cost")
+
+Usage = dict[str, float]
+
+ModelUsage = dict[str, Usage]
+"""Usage records indexed by fully specified model name."""
+
+
+def add_usage(left: Usage, right: Usage) -> Usage:
+    """Sum two usage records. Used as the reducer of `State.usage`."""
+    return {key: left.get(key, 0) + right.get(key, 0) for key in USAGE_KEYS}
+
+
+def add_model_usage(left: ModelUsage, right: ModelUsage) -> ModelUsage:
+    """Sum usage records per model. Used as the reducer of `State.model_usage`."""
+    return {
+        model: add_usage(left.get(model, {}), right.get(model, {}))
+        for model in left.keys() | right.keys()
+    }
+
+
+def message_usage(message: AIMessage, prices: ModelPrices) -> Usage:
+    """Extract the usage of a model response and price it."""
+    metadata = message.usage_metadata
+    if not metadata:
+        return {}
+
+    input_tokens = metadata.get("input_tokens", 0)
+    output_tokens = metadata.get("output_tokens", 0)
+    cached_tokens = (metadata.get("input_token_details") or {}).get("cache_read", 0)
+    cost = (
+        (input_tokens - cached_tokens) * prices.input
+        + cached_tokens * prices.cached_input
+        + output_tokens * prices.output
+    ) / 1_000_000
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_tokens": cached_tokens,
+        "cost": cost,
+    }
+
+
+def total_tokens(usage: Usage) -> int:
+    """Return the number of input and output tokens of a usage record."""
+    return int(usage.get("input_tokens", 0) + usage.get("output_tokens", 0))
+
+
+def budget_exceeded(usage: Usage, budget: BudgetConfig | None) -> bool:
+    """Check whether a usage record has reached a budget."""
+    if budget is None:
+        return False
+    if budget.tokens is not None and total_tokens(usage) >= budget.tokens:
+        return True
+    return budget.cost is not None and usage.get("cost", 0) >= budget.cost
+
+
+def format_usage(usage: Usage) -> str:
+    """Format a usage record compactly, e.g. `12.3k tok $0.0412`."""
+    tokens = total_tokens(usage)
+    text = f"{tokens / 1000:.1f}k tok" if tokens >= 1000 else f"{tokens} tok"
+    if cost := usage.get("cost", 0):
+        text += f" ${cost:.4f}"
+    return text
+
+
+def record_session(
+    session_id: str,
+    model_usage: ModelUsage,
+    path: Path = DEFAULT_USAGE_LOG_PATH,
+) -> None:
+    """Append the usage of a finished session to the usage log, one record per model."""
+    if not model_usage:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    with open(path, "a") as f:
+        for model, usage in sorted(model_usage.items()):
+            record = {"session": session_id, "time": now, "model": model, **usage}
+            f.write(json.dumps(record) + "\n")
+
+
+def read_sessions(path: Path = DEFAULT_USAGE_LOG_PATH) -> list[dict[str, Any]]:
+    """Read the session records of the usage log."""
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(sessions: Iterable[dict[str, Any]]) -> str:
+    """Summarize session records per day and model as a plain-text table."""
+    rows: dict[tuple[str, str], Usage] = defaultdict(dict)
+    counts: dict[tuple[str, str], int] = defaultdict(int)
+    session_ids = set()
+    total: Usage = {}
+    for session in sessions:
+        day = time.strftime("%Y-%m-%d", time.localtime(session["time"]))
+        key = (day, session["model"])
+        rows[key] = add_usage(rows[key], session)
+        counts[key] += 1
+        session_ids.add(session["session"])
+        total = add_usage(total, session)
+
+    header = f"{'day':<10}  {'model':<32} {'sessions':>8} {'input':>10} {'cached':>10} {'output':>10} {'cost':>10}"
+    lines = [header, "-" * len(header)]
+    for (day, model), usage in sorted(rows.items()):
+        lines.append(
+            f"{day:<10}  {model:<32} {counts[day, model]:>8} "
+            f"{int(usage['input_tokens']):>10} {int(usage['cached_tokens']):>10} "
+            f"{int(usage['output_tokens']):>10} {usage['cost']:>10.4f}"
+        )
+    lines.append("-" * len(header))
+    lines.append(
+        f"{'total':<10}  {'':<32} {len(session_ids):>8} "
+        f"{int(total.get('input_tokens', 0)):>10} {int(total.get('cached_tokens', 0)):>10} "
+        f"{int(total.get('output_tokens', 0)):>10} {total.get('cost', 0):>10.4f}"
+    )
+    return "\n".join(lines)
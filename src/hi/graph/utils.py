@@ -5,6 +5,7 @@ from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import BaseMessage
 
 from hi.graph.configuration import ModelConfig
+from hi.graph.ratelimit import SharedRateLimiter, bucket_key
 
 
 def get_message_text(msg: BaseMessage) -> str:
@@ -19,16 +20,40 @@ def get_message_text(msg: BaseMessage) -> str:
         return "".join(txts).strip()
 
 
+_chat_models: dict[str, BaseChatModel] = {}
+
+
 def load_chat_model(config: ModelConfig) -> BaseChatModel:
     """Load a chat model from a fully specified name.
 
+    Models are cached per configuration, so that concurrent conversations share
+    the same client connection pool. The rate limiter is shared with the other
+    `hi` processes using the same provider key.
+
     Args:
         fully_specified_name (str): String in the format 'provider/model'.
     """
+    key = config.model_dump_json()
+    if key in _chat_models:
+        return _chat_models[key]
+
     provider, model = config.fully_specified_name.split("/", maxsplit=1)
     kwargs = config.kwargs.copy()
     if config.api_key:
         kwargs["api_key"] = config.api_key
     if config.base_url:
         kwargs["base_url"] = config.base_url
-    return init_chat_model(model, model_provider=provider, **kwargs)
+    if provider == "ollama" and config.keep_alive is not None:
+        kwargs.setdefault("keep_alive", config.keep_alive)
+    if config.requests_per_second:
+        kwargs["rate_limiter"] = SharedRateLimiter(
+            bucket_key(provider, config.base_url, config.api_key),
+            requests_per_second=config.requests_per_second,
+        )
+        # Retries of the client would bypass the shared bucket and its backoff,
+        # `ainvoke_with_backoff` retries instead. The Ollama client has none.
+        if provider != "ollama":
+            kwargs.setdefault("max_retries", 0)
+    chat_model = init_chat_model(model, model_provider=provider, **kwargs)
+    _chat_models[key] = chat_model
+    return chat_model
@@ -0,0 +1,93 @@
+"""Warm-up of self-hosted models.
+
+Ollama loads the weights of a model on its first request and unloads them after
+`keep_alive` of inactivity, so the first prompt after a while waits for the
+model to load. A minimal request sent when `hi` starts overlaps the load with
+the capture of the window content, and sets how long the model stays loaded.
+
+OpenAI-compatible servers given by `base_url` (vLLM, llama.cpp) receive a one
+token completion, which warms their caches; they have no keep-alive setting.
+Hosted providers are never warmed up.
+"""
+
+import logging
+import time
+from typing import Any
+
+import httpx
+
+from hi.graph.configuration import ModelConfig
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+PIN_KEEP_ALIVE = -1
+"""Ollama keep-alive value that keeps a model loaded until the server stops."""
+
+WARM_UP_TIMEOUT = 300.0
+"""Seconds to wait for a model to load."""
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up_request(
+    config: ModelConfig, keep_alive: str | int | None = None
+) -> tuple[str, dict[str, Any], dict[str, str]] | None:
+    """Return the URL, body and headers of the warm-up request of a model.
+
+    Returns None for models that are not self-hosted.
+    """
+    provider, model = config.fully_specified_name.split("/", maxsplit=1)
+    keep_alive = config.keep_alive if keep_alive is None else keep_alive
+
+    if provider == "ollama":
+        # Without a prompt, Ollama only loads the model
+        body: dict[str, Any] = {"model": model}
+        if keep_alive is not None:
+            body["keep_alive"] = keep_alive
+        base_url = (config.base_url or OLLAMA_BASE_URL).rstrip("/")
+        return f"{base_url}/api/generate", body, {}
+
+    if provider == "openai" and config.base_url:
+        body = {
+            "model": model,
+            "messages": [{"role": "user", "content": "hi"}],
+            "max_tokens": 1,
+        }
+        headers = {}
+        if config.api_key:
+            headers["Authorization"] = f"Bearer {config.api_key}"
+        return f"{config.base_url.rstrip('/')}/chat/completions", body, headers
+
+    return None
+
+
+async def warm_up(
+    config: ModelConfig,
+    keep_alive: str | int | None = None,
+    timeout: float = WARM_UP_TIMEOUT,
+) -> float | None:
+    """Send the warm-up request of a model.
+
+    Args:
+        config (ModelConfig): The model to warm up.
+        keep_alive (str | int | None): Overrides the `keep_alive` of the model.
+        timeout (float): Seconds to wait for the model to load.
+
+    Returns:
+        float | None: Seconds taken by the request, or None if the model is not
+            self-hosted or the request failed.
+    """
+    request = warm_up_request(config, keep_alive)
+    if request is None:
+        return None
+    url, body, headers = request
+
+    start = time.monotonic()
+    try:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.post(url, json=body, headers=headers)
+            response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.debug(f"Warm-up of {config.fully_specified_name} failed: {e!r}")
+        return None
+    return time.monotonic() - start
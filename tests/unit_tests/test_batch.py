@@ -0,0 +1,84 @@
+import asyncio
+import io
+import json
+from typing import Any
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.checkpoint.memory import InMemorySaver
+
+from hi.cli import batch
+from hi.graph.configuration import Configuration
+from hi.graph.graph import build_graph
+
+
+class _CommandModel(BaseChatModel):
+    """Run `touch <prompt>` once, then answer with the output of the command."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "command"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "_CommandModel":
+        return self
+
+    def _generate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        # The prompt follows the batch context in the first message
+        prompt = str(messages[-1].content).splitlines()[-1]
+        if "fail" in prompt:
+            raise RuntimeError("provider error")
+        if isinstance(messages[-1], ToolMessage):
+            message = AIMessage(content=f"result: {messages[-1].content}")
+        else:
+            message = AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": "execute_command",
+                        "args": {"command": f"touch {prompt}", "explanation": "x"},
+                        "id": f"call-{prompt}",
+                    }
+                ],
+            )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+@pytest.mark.parametrize("approve", ["approve", "deny"])
+def test_run_batch(tmp_path, monkeypatch, approve: batch.ApprovalPolicy) -> None:
+    graph = build_graph(
+        checkpointer=InMemorySaver(), model_factory=lambda _: _CommandModel()
+    )
+    monkeypatch.setattr(batch, "graph", graph)
+    paths = [tmp_path / "a", tmp_path / "b"]
+    items = [
+        {"id": 1, "prompt": str(paths[0])},
+        {"id": 2, "prompt": "fail"},
+        {"id": 3, "prompt": str(paths[1])},
+    ]
+    output = io.StringIO()
+    failed = asyncio.run(batch.run_batch(items, Configuration(), output, 2, approve))
+
+    records = {
+        record["id"]: record
+        for record in map(json.loads, output.getvalue().splitlines())
+    }
+    assert failed == 1
+    assert set(records) == {1, 2, 3}
+    assert records[2]["error"] == "RuntimeError: provider error"
+    for item, path in zip([1, 3], paths):
+        record = records[item]
+        assert "error" not in record
+        assert record["tool_calls"] == [
+            {
+                "command": f"touch {path}",
+                "explanation": "x",
+                "approved": approve == "approve",
+            }
+        ]
+        assert path.exists() == (approve == "approve")
+        if approve == "deny":
+            assert record["response"] == f"result: {batch.DENIED_FEEDBACK}"
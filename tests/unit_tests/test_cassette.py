@@ -0,0 +1,51 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from hi.graph.cassette import load_cassette, replay, save_cassette
+
+
+def test_record_and_replay(tmp_path) -> None:
+    messages = [
+        HumanMessage("what is in this directory?"),
+        AIMessage(
+            content="",
+            tool_calls=[
+                {
+                    "name": "execute_command",
+                    "args": {"command": "ls", "explanation": "list files"},
+                    "id": "call_0",
+                }
+            ],
+        ),
+        ToolMessage(
+            '{"stdout": "README.md", "code": 0}',
+            tool_call_id="call_0",
+            name="execute_command",
+        ),
+        AIMessage(content="There is a README."),
+        HumanMessage("thanks"),
+        AIMessage(content="You're welcome."),
+    ]
+    path = tmp_path / "session.json"
+    save_cassette(path, messages, {"%1": ["$ ls", "README.md"]}, "%1", "openai/test")
+
+    cassette = load_cassette(path)
+    assert cassette.prompts == ["what is in this directory?", "thanks"]
+    assert cassette.window_content == {"%1": ["$ ls", "README.md"]}
+
+    report = asyncio.run(replay(cassette))
+    assert report["steps"] == 3
+    assert report["unused_responses"] == 0
+    # Each step sends the whole conversation, so prompts only grow
+    tokens = report["step_prompt_tokens"]
+    assert tokens == sorted(tokens)
+    assert report["prompt_tokens"] == sum(tokens)
+    assert {"call_model", "human_feedback", "tools"} <= report["node_seconds"].keys()
+
+    # Each replay has its own fake model, so replays can run concurrently
+    async def replay_twice() -> list[dict]:
+        return await asyncio.gather(replay(cassette), replay(cassette))
+
+    for concurrent_report in asyncio.run(replay_twice()):
+        assert concurrent_report["step_prompt_tokens"] == tokens
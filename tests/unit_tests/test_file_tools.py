@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+from hi.graph.configuration import CommandPolicy
+from hi.graph.file_tools import MAX_OUTPUT_CHARS, _list, _read_lines, _search
+
+
+def _matched_files(path: str, policy: CommandPolicy | None = None) -> set[str]:
+    output = _search("needle", path, None, 100, False, policy or CommandPolicy())
+    return {line.split(":")[0] for line in output["matches"].splitlines()}
+
+
+def test_search_respects_gitignore(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("build/\n*.log\n")
+    for name in ["src/a.txt", "src/build/x.txt", "src/sub/secret.txt", "src/b.log"]:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text("needle\n")
+    (tmp_path / "src/.gitignore").write_text("secret.txt\n!b.log\n")
+
+    # Rules above the search root apply, and the root's rules reach subdirectories
+    for path in ["src", "src/", "./src"]:
+        assert _matched_files(path) == {"src/a.txt", "src/b.log"}, path
+    assert _matched_files(".") == {"./src/a.txt", "./src/b.log"}
+
+
+def test_search_skips_denied_paths(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    for name in ["a.txt", ".env", "keys/id.txt"]:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text("needle\n")
+    policy = CommandPolicy(deny_paths=[".env", "keys"])
+    assert _matched_files(".", policy) == {"./a.txt"}
+
+
+def test_read_line_window(tmp_path) -> None:
+    path = tmp_path / "lines.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1, 11)))
+    output = _read_lines(str(path), 3, 5)
+    assert output["content"] == "line 3\nline 4\nline 5\n"
+    assert (output["start_line"], output["end_line"]) == (3, 5)
+    assert "truncated" not in output
+    output = _read_lines(str(path), 9, None)
+    assert output["content"] == "line 9\nline 10\n"
+    assert "truncated" not in output
+    assert "fewer than 20 lines" in _read_lines(str(path), 20, None)["error"]
+
+
+def test_read_truncates_long_files(tmp_path) -> None:
+    path = tmp_path / "long.txt"
+    path.write_text("x" * 100 + "\n" + "y" * MAX_OUTPUT_CHARS + "\n")
+    output = _read_lines(str(path), 1, None)
+    assert len(output["content"]) == MAX_OUTPUT_CHARS
+    assert output["truncated"]
+
+
+def test_read_special_files(tmp_path) -> None:
+    (tmp_path / "empty.txt").touch()
+    assert _read_lines(str(tmp_path / "empty.txt"), 1, None)["content"] == ""
+    (tmp_path / "data.bin").write_bytes(b"abc\0def")
+    assert "binary" in _read_lines(str(tmp_path / "data.bin"), 1, None)["error"]
+    os.mkfifo(tmp_path / "fifo")
+    assert "not a regular" in _read_lines(str(tmp_path / "fifo"), 1, None)["error"]
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="needs /proc")
+def test_read_proc_files() -> None:
+    # The size of /proc files is 0
+    output = _read_lines("/proc/self/status", 1, None)
+    assert output["content"].startswith("Name:")
+    assert "State:" in output["content"]
+
+
+def test_list_directory(tmp_path) -> None:
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("build/\n*.log\n")
+    for name in [
+        "src/pkg/mod.py",
+        "src/app.py",
+        "src/build/out.o",
+        "run.log",
+        "README",
+    ]:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text("x")
+
+    output = _list(str(tmp_path), False, 1)
+    assert output["entries"].splitlines() == ["src/", "README\t1"]
+    output = _list(str(tmp_path / "src"), False, 3)
+    assert output["entries"].splitlines() == ["pkg/", "pkg/mod.py\t1", "app.py\t1"]
+    # Depth limit
+    assert _list(str(tmp_path), False, 2)["entries"].splitlines() == [
+        "src/",
+        "src/pkg/",
+        "src/app.py\t1",
+        "README\t1",
+    ]
+    assert "build/" in _list(str(tmp_path / "src"), True, 1)["entries"]
@@ -0,0 +1,33 @@
+import asyncio
+
+from hi.graph.configuration import ResourceLimits
+from hi.graph.limits import run_command
+
+
+def test_exit_code_and_usage() -> None:
+    result = asyncio.run(
+        run_command("echo out; echo err >&2; exit 3", ResourceLimits())
+    )
+    assert (result.stdout, result.stderr, result.code) == (b"out\n", b"err\n", 3)
+    assert result.error is None
+    assert set(result.usage()) == {"wall_seconds", "cpu_seconds", "max_rss_mb"}
+
+
+def test_file_size_limit(tmp_path) -> None:
+    path = tmp_path / "big"
+    result = asyncio.run(
+        run_command(
+            f"head -c 3000000 /dev/zero > {path}", ResourceLimits(file_size_mb=1)
+        )
+    )
+    assert result.code != 0
+    assert path.stat().st_size == 1024 * 1024
+
+
+def test_kill_after_kills_the_process_group() -> None:
+    result = asyncio.run(
+        run_command("sleep 30 & sleep 30; echo done", ResourceLimits(kill_after=0.5))
+    )
+    assert result.error == "Killed after 0.5 seconds."
+    assert result.wall_seconds < 5
+    assert b"done" not in result.stdout
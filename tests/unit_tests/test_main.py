@@ -0,0 +1,70 @@
+import asyncio
+import uuid
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.checkpoint.memory import InMemorySaver
+
+from hi.cli import main
+from hi.graph.configuration import Configuration
+from hi.graph.graph import build_graph
+
+
+class _ToolCallingModel(BaseChatModel):
+    """Run one command, then answer with its output."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "tool-calling"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "_ToolCallingModel":
+        return self
+
+    def _generate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        if isinstance(messages[-1], ToolMessage):
+            message = AIMessage(content=f"done: {messages[-1].content}")
+        else:
+            # `tee` is not read-only, so the command needs confirmation without yolo
+            tool_call = {
+                "name": "execute_command",
+                "args": {
+                    "command": "echo ran | tee /dev/null",
+                    "explanation": "x",
+                },
+                "id": "call-1",
+            }
+            message = AIMessage(content="", tool_calls=[tool_call])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def test_yolo_turn_runs_without_interrupt(monkeypatch) -> None:
+    graph = build_graph(
+        checkpointer=InMemorySaver(), model_factory=lambda _: _ToolCallingModel()
+    )
+    monkeypatch.setattr(main, "graph", graph)
+    monkeypatch.setattr(main, "record_session", lambda *args: None)
+
+    async def no_interrupt(*args: Any) -> None:
+        raise AssertionError("yolo mode asked for confirmation")
+
+    monkeypatch.setattr(main, "_handle_interrupt", no_interrupt)
+    thread_id = uuid.uuid4()
+    asyncio.run(
+        main._run_interaction_loop(
+            {"messages": "run it"},
+            Configuration(),
+            yolo=True,
+            interactive=False,
+            thread_id=thread_id,
+        )
+    )
+
+    messages = graph.get_state({"configurable": {"thread_id": thread_id}}).values[
+        "messages"
+    ]
+    assert isinstance(messages[-2], ToolMessage)
+    assert "ran" in str(messages[-1].content)
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from hi.graph.configuration import ModelConfig
+from hi.graph.ratelimit import (
+    SharedRateLimiter,
+    ainvoke_with_backoff,
+    request_priority,
+)
+from hi.graph.utils import load_chat_model
+
+
+def test_bucket_is_shared(tmp_path) -> None:
+    path = tmp_path / "ratelimit.sqlite"
+    first = SharedRateLimiter("key", requests_per_second=100, path=path)
+    second = SharedRateLimiter("key", requests_per_second=100, path=path)
+    other = SharedRateLimiter("other", requests_per_second=100, path=path)
+
+    assert first.acquire(blocking=False)
+    assert not second.acquire(blocking=False)
+    assert other.acquire(blocking=False)
+
+    start = time.monotonic()
+    assert second.acquire()
+    assert time.monotonic() - start < 0.5
+
+
+def test_background_yields_to_interactive(tmp_path) -> None:
+    limiter = SharedRateLimiter("key", requests_per_second=1, path=tmp_path / "db")
+    assert limiter.acquire(blocking=False)
+    # An interactive request is now waiting for the next token
+    assert not limiter.acquire(blocking=False)
+    limiter._try_acquire("interactive-waiter", "interactive")
+
+    token = request_priority.set("background")
+    try:
+        limiter.requests_per_second = 1000
+        assert not limiter.acquire(blocking=False)
+        limiter._cancel("interactive-waiter")
+        assert limiter.acquire(blocking=False)
+    finally:
+        request_priority.reset(token)
+
+
+def test_throttle_backs_off(tmp_path) -> None:
+    limiter = SharedRateLimiter("key", requests_per_second=1000, path=tmp_path / "db")
+    limiter.record_throttle(delay=0.2)
+    assert not limiter.acquire(blocking=False)
+
+    start = time.monotonic()
+    assert limiter.acquire()
+    assert time.monotonic() - start >= 0.15
+
+    rate_factor = (
+        limiter._connect().execute("SELECT rate_factor FROM buckets").fetchone()[0]
+    )
+    assert rate_factor == 0.5
+    limiter.record_success()
+    rate_factor = (
+        limiter._connect().execute("SELECT rate_factor FROM buckets").fetchone()[0]
+    )
+    assert rate_factor == 0.625
+
+
+class _ProviderError(Exception):
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={"retry-after": "0.1"})
+
+
+def test_backoff_retries_concurrent_requests(tmp_path) -> None:
+    limiter = SharedRateLimiter(
+        "key", requests_per_second=1000, max_bucket_size=8, path=tmp_path / "db"
+    )
+    failures = [_ProviderError(429), _ProviderError(503)]
+
+    async def call(input: int) -> int:
+        # Concurrent requests share the limiter's connection from worker threads
+        await limiter.aacquire()
+        if input == 0 and failures:
+            raise failures.pop(0)
+        return input
+
+    async def run() -> list[int]:
+        runnable = RunnableLambda(call)
+        return await asyncio.gather(
+            *(ainvoke_with_backoff(runnable, i, limiter) for i in range(8))
+        )
+
+    assert asyncio.run(run()) == list(range(8))
+    assert not failures
+    with pytest.raises(_ProviderError):
+        failures.append(_ProviderError(400))
+        asyncio.run(run())
+
+
+def test_client_retries_are_disabled() -> None:
+    config = ModelConfig(
+        fully_specified_name="openai/gpt-4o-mini", api_key="key", requests_per_second=1
+    )
+    assert load_chat_model(config).max_retries == 0  # type: ignore[attr-defined]
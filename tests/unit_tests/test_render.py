@@ -0,0 +1,81 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from hi.cli.render import ToolCallRenderer, command_names, preflight
+from hi.graph.configuration import CommandPolicy
+
+
+def test_command_names() -> None:
+    assert command_names("LANG=C sudo ls -l | grep x && (cd /tmp; make)") == [
+        "ls",
+        "grep",
+        "cd",
+        "make",
+    ]
+    assert command_names("echo 'a; b' > out") == ["echo"]
+    assert command_names("echo 'unterminated") == []
+
+
+def test_preflight() -> None:
+    assert preflight("ls -la | head") == []
+    assert preflight("no-such-program-hi --version") == [
+        "`no-such-program-hi` was not found on PATH.",
+        "Needs confirmation: `no-such-program-hi` is not known to be read-only.",
+    ]
+    assert preflight("rm -rf build") == ["This command may delete or overwrite data."]
+    policy = CommandPolicy(deny=["cat"])
+    assert preflight("cat README.md", policy) == [
+        "Needs confirmation: denied by rule `cat`."
+    ]
+
+
+def _chunk(args: str, message_id: str = "run-1") -> AIMessageChunk:
+    return AIMessageChunk(
+        content="",
+        id=message_id,
+        tool_call_chunks=[{"name": None, "args": args, "id": None, "index": 0}],
+    )
+
+
+def test_streamed_tool_call(capsys) -> None:
+    command = "ls -la | head"
+
+    async def scenario() -> list[str]:
+        renderer = ToolCallRenderer()
+        for args in ['{"comm', 'and": "ls -la', ' | head"', ', "explan', 'ation": "']:
+            renderer.feed(_chunk(args))
+            # The command is only complete once the next argument starts
+            assert renderer.shown(command) == args.startswith("ation")
+        renderer.feed(_chunk('List files"}'))
+        renderer.finish(
+            AIMessage(
+                content="",
+                id="run-1",
+                tool_calls=[
+                    {
+                        "name": "execute_command",
+                        "args": {"command": command, "explanation": "List files"},
+                        "id": "call-1",
+                    }
+                ],
+            )
+        )
+        return await renderer.warnings(command)
+
+    assert asyncio.run(scenario()) == []
+    output = capsys.readouterr().out
+    # Every part is printed once, in order
+    assert output.count("Command to execute") == 1
+    assert f"`{command}`" in output
+    assert output.index(command) < output.index("Explanation: List files")
+
+
+def test_new_message_resets_the_renderer() -> None:
+    async def scenario() -> tuple[bool, bool]:
+        renderer = ToolCallRenderer()
+        renderer.feed(_chunk('{"command": "ls", "explanation": "x"}'))
+        renderer.feed(_chunk('{"command": "pw', message_id="run-2"))
+        return renderer.shown("ls"), renderer._printed["command"] == "pw"
+
+    assert asyncio.run(scenario()) == (False, True)
@@ -0,0 +1,53 @@
+from hi.context.selector import estimate_tokens, select_context
+
+
+def _filler(n: int, prefix: str = "line") -> list[str]:
+    return [f"{prefix} {i} nothing interesting happens here" for i in range(n)]
+
+
+def test_small_content_is_kept() -> None:
+    window = {"%1": ["$ ls", "README.md", "", ""], "%2": ["top"]}
+    selected = select_context(window, "%1", "files", token_budget=1000)
+    assert selected == {"%1": "$ ls\nREADME.md", "%2": "top"}
+    assert select_context(window, "%1", "files", None) == selected
+
+
+def test_budget_and_tail() -> None:
+    lines = _filler(1000)
+    selected = select_context({"%1": lines}, "%1", "query", token_budget=500)
+    kept = [line for line in selected["%1"].split("\n") if not line.startswith("[...")]
+    assert estimate_tokens("\n".join(kept)) <= 500
+    # The tail of the current pane is kept in full, after the omitted lines
+    assert selected["%1"].endswith("\n".join(lines[-40:]))
+    assert "lines omitted ...]" in selected["%1"]
+
+    # The tail is kept even when it exceeds the budget on its own
+    selected = select_context(
+        {"%1": lines}, "%1", "query", token_budget=0, tail_lines=5
+    )
+    assert selected == {"%1": "[... 995 lines omitted ...]\n" + "\n".join(lines[-5:])}
+
+
+def test_relevant_and_error_chunks_are_selected() -> None:
+    current = _filler(300)
+    other = _filler(300, "other")
+    other[100] = "Traceback (most recent call last):"
+    other[101] = "ValueError: invalid literal for int()"
+    current[50] = "deploying kubernetes manifests to staging"
+
+    selected = select_context(
+        {"%1": current, "%2": other},
+        "%1",
+        "kubernetes manifests staging",
+        token_budget=600,
+        tail_lines=10,
+    )
+    assert "deploying kubernetes manifests" in selected["%1"]
+    assert "ValueError: invalid literal" in selected["%2"]
+    assert "other 250 " not in selected["%2"]
+
+
+def test_panes_without_selection_are_omitted() -> None:
+    window = {"%1": _filler(100), "%2": _filler(500, "other")}
+    selected = select_context(window, "%1", "query", token_budget=0, tail_lines=10)
+    assert list(selected) == ["%1"]
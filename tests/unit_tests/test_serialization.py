@@ -0,0 +1,30 @@
+import json
+
+from hi.graph.serialization import format_panes, format_tool_content
+
+
+def test_compact_tool_content() -> None:
+    content = json.dumps(
+        {
+            "stdout": "line 1\nline 2",
+            "stderr": "",
+            "code": 0,
+            "usage": {"wall_seconds": 0.5, "max_rss_mb": None},
+            "truncated": True,
+        }
+    )
+    assert format_tool_content(content, "compact") == (
+        "code: 0\nusage: wall_seconds=0.5\ntruncated: true\nstdout:\nline 1\nline 2"
+    )
+    assert format_tool_content(content, "verbose") == content
+    assert format_tool_content("not json", "compact") == "not json"
+
+
+def test_compact_panes() -> None:
+    panes = {"%1": "$ make", "%2": "", "%3": "vim"}
+    assert format_panes(panes, "%1", "compact") == (
+        "## Current tmux pane %1:\n$ make\n## Other pane %3:\nvim"
+    )
+    assert format_panes(panes, "%1", "verbose").startswith(
+        "## Current tmux window state:\n<current_pane>$ make</current_pane>"
+    )
@@ -0,0 +1,41 @@
+import io
+
+from hi.context.stdin import read_stream
+
+
+def _stream(n: int) -> io.BytesIO:
+    return io.BytesIO("".join(f"line {i}\n" for i in range(n)).encode())
+
+
+def test_short_input_is_kept() -> None:
+    assert read_stream(_stream(5)) == [f"line {i}" for i in range(5)]
+    assert read_stream(io.BytesIO(b"a\r\nb")) == ["a", "b"]
+    assert read_stream(io.BytesIO(b"")) == []
+
+
+def test_head_tail_and_sample() -> None:
+    lines = read_stream(_stream(10_000), max_lines=80)
+    content = [line for line in lines if not line.startswith("[...")]
+    assert len(content) == 80
+    assert content[:20] == [f"line {i}" for i in range(20)]
+    assert content[-40:] == [f"line {i}" for i in range(9960, 10_000)]
+
+    # The sample comes from the middle, in order, with markers for the gaps
+    sample = [int(line.split()[1]) for line in content[20:-40]]
+    assert len(sample) == 20
+    assert sample == sorted(sample) and 20 <= sample[0] and sample[-1] < 9960
+    omitted = sum(int(line.split()[1]) for line in lines if line.startswith("[... "))
+    assert omitted == 10_000 - 80
+
+    # The same seed gives the same capture
+    assert read_stream(_stream(10_000), max_lines=80) == lines
+
+
+def test_overlong_lines_are_truncated() -> None:
+    stream = io.BytesIO(b"x" * 5000 + b"\nshort\n" + b"y" * 150)
+    lines = read_stream(stream, max_line_length=100)
+    assert lines == [
+        "x" * 100 + " [... line truncated ...]",
+        "short",
+        "y" * 100 + " [... line truncated ...]",
+    ]
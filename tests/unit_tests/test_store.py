@@ -0,0 +1,103 @@
+import asyncio
+import gc
+import uuid
+from typing import Any
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.checkpoint.memory import InMemorySaver
+
+from hi.graph.configuration import Configuration
+from hi.graph.graph import build_graph
+from hi.graph.store import (
+    BLOB_KEY,
+    BLOB_STORE,
+    BLOB_THRESHOLD,
+    BlobStore,
+    offload_fields,
+    resolve_fields,
+    store_window_content,
+)
+
+
+class _EchoModel(BaseChatModel):
+    """Answer with the length of the prompt, without keeping it."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "_EchoModel":
+        return self
+
+    def _generate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        message = AIMessage(content=str(len(str(messages[-1].content))))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def test_blobs_are_evicted_with_their_last_session() -> None:
+    store = BlobStore()
+    shared = store.put("shared capture", "a")
+    assert store.put("shared capture", "b") == shared
+    own = store.put("only a", "a")
+    assert len(store) == 2
+
+    store.release("a")
+    assert len(store) == 1
+    assert store.get(shared) == "shared capture"
+    with pytest.raises(KeyError):
+        store.get(own)
+
+    store.release("b")
+    assert len(store) == 0
+    # Releasing an unknown or already released session is a no-op
+    store.release("b")
+
+
+def test_long_fields_are_offloaded() -> None:
+    long_text = "x" * (BLOB_THRESHOLD + 1)
+    output = offload_fields({"stdout": long_text, "code": 0}, "session")
+    assert output["code"] == 0
+    assert set(output["stdout"]) == {BLOB_KEY}
+    assert resolve_fields(output) == {"stdout": long_text, "code": 0}
+    BLOB_STORE.release("session")
+
+
+def _strings_containing(marker: str) -> list[str]:
+    """Return the strings around a marker that are referenced by live objects."""
+    gc.collect()
+    return [
+        referent
+        for obj in gc.get_objects()
+        for referent in gc.get_referents(obj)
+        if isinstance(referent, str) and marker in referent and referent != marker
+    ]
+
+
+def test_released_pane_content_is_freed() -> None:
+    graph = build_graph(
+        checkpointer=InMemorySaver(), model_factory=lambda _: _EchoModel()
+    )
+    marker = uuid.uuid4().hex
+    window_content = store_window_content({"%1": [f"pane {marker}"] * 3}, "t")
+    config = {"configurable": {"thread_id": "t", **Configuration().model_dump()}}
+
+    async def run() -> None:
+        await graph.ainvoke(
+            {
+                "messages": "hi",
+                "window_content": window_content,
+                "current_pane_id": "%1",
+            },
+            config,
+        )
+
+    asyncio.run(run())
+    BLOB_STORE.release("t")
+    with pytest.raises(KeyError):
+        BLOB_STORE.get(window_content["%1"])
+    assert not _strings_containing(marker)
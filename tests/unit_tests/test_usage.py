@@ -0,0 +1,71 @@
+import asyncio
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.checkpoint.memory import InMemorySaver
+
+from hi.graph.configuration import BudgetConfig, Configuration, ModelConfig
+from hi.graph.graph import build_graph
+from hi.graph.usage import read_sessions, record_session, summarize
+
+
+class _AnsweringModel(BaseChatModel):
+    """Answer every prompt with a fixed token usage."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "answering"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "_AnsweringModel":
+        return self
+
+    def _generate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        message = AIMessage(
+            content="ok",
+            usage_metadata={
+                "input_tokens": 100,
+                "output_tokens": 10,
+                "total_tokens": 110,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def test_usage_is_recorded_per_model(tmp_path) -> None:
+    graph = build_graph(
+        checkpointer=InMemorySaver(), model_factory=lambda _: _AnsweringModel()
+    )
+    configuration = Configuration(
+        smart_model=ModelConfig(fully_specified_name="openai/smart"),
+        fast_model=ModelConfig(fully_specified_name="openai/fast"),
+        default_model="smart",
+        # Past the first response, the fast model is used
+        soft_budget=BudgetConfig(tokens=100),
+    )
+    config = {"configurable": {"thread_id": "t", **configuration.model_dump()}}
+
+    async def run() -> dict[str, Any]:
+        for prompt in ["first", "second", "third"]:
+            await graph.ainvoke({"messages": prompt}, config)
+        return (await graph.aget_state(config)).values
+
+    state = asyncio.run(run())
+    assert state["usage"]["input_tokens"] == 300
+    assert state["model_usage"]["openai/smart"]["input_tokens"] == 100
+    assert state["model_usage"]["openai/fast"]["input_tokens"] == 200
+
+    path = tmp_path / "usage.jsonl"
+    record_session("t", state["model_usage"], path)
+    sessions = read_sessions(path)
+    assert {(s["model"], s["output_tokens"]) for s in sessions} == {
+        ("openai/smart", 10),
+        ("openai/fast", 20),
+    }
+    # Both models are listed, but the session is counted once in the total
+    table = summarize(sessions)
+    assert "openai/smart" in table and "openai/fast" in table
+    assert table.splitlines()[-1].split()[1] == "1"
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from hi.graph.configuration import ModelConfig
+from hi.graph.warmup import PIN_KEEP_ALIVE, warm_up
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests: list[tuple[str, dict, str | None]] = []
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append((self.path, body, self.headers.get("Authorization")))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.requests = []
+    httpd = HTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_ollama_keep_alive(server) -> None:
+    config = ModelConfig(
+        fully_specified_name="ollama/llama3:8b", base_url=server, keep_alive="30m"
+    )
+    assert asyncio.run(warm_up(config)) is not None
+    assert asyncio.run(warm_up(config, keep_alive=PIN_KEEP_ALIVE)) is not None
+    assert _Handler.requests == [
+        ("/api/generate", {"model": "llama3:8b", "keep_alive": "30m"}, None),
+        ("/api/generate", {"model": "llama3:8b", "keep_alive": -1}, None),
+    ]
+
+
+def test_openai_compatible_server(server) -> None:
+    config = ModelConfig(
+        fully_specified_name="openai/qwen", base_url=f"{server}/v1", api_key="key"
+    )
+    assert asyncio.run(warm_up(config)) is not None
+    [(path, body, authorization)] = _Handler.requests
+    assert (path, body["model"], body["max_tokens"]) == (
+        "/v1/chat/completions",
+        "qwen",
+        1,
+    )
+    assert authorization == "Bearer key"
+
+
+def test_hosted_and_unreachable_models() -> None:
+    assert (
+        asyncio.run(warm_up(ModelConfig(fully_specified_name="openai/gpt-4o"))) is None
+    )
+    unreachable = ModelConfig(
+        fully_specified_name="ollama/llama3:8b", base_url="http://127.0.0.1:9"
+    )
+    assert asyncio.run(warm_up(unreachable, timeout=2)) is None
@@ -0,0 +1,99 @@
+import asyncio
+import re
+from types import SimpleNamespace
+
+from hi.context.watcher import PaneWatcher, Trigger, decode_output
+
+
+def _connect(watcher: PaneWatcher) -> asyncio.StreamReader:
+    """Connect a watcher to a fake control-mode client and return its stdout."""
+    stdout = asyncio.StreamReader()
+    watcher._proc = SimpleNamespace(stdout=stdout, returncode=None)  # type: ignore[assignment]
+    attached = asyncio.get_running_loop().create_future()
+    watcher._reader = asyncio.create_task(watcher._read(attached))
+    stdout.feed_data(b"%session-changed $1 main\n")
+    return stdout
+
+
+def test_decode_output() -> None:
+    assert decode_output("a\\015\\012b") == "a\r\nb"
+    assert decode_output("\\033[1;31mred\\033[0m \\134") == "red \\"
+    assert decode_output("caf\\303\\251") == "café"
+
+
+def test_output_lines_and_carriage_returns() -> None:
+    watcher = PaneWatcher("$1", buffer_lines=3)
+    watcher._on_output("%1", "one\r\ntw")
+    watcher._on_output("%1", "o\n10%\r50%\r100%\r\nprompt$ ")
+    buffer = watcher.buffers["%1"]
+    assert list(buffer.lines) == ["one", "two", "100%"]
+    assert buffer.tail(2) == ["100%", "prompt$ "]
+    watcher._on_output("%1", "\nlast\n")
+    assert list(buffer.lines) == ["100%", "prompt$ ", "last"]
+
+
+def test_exit_and_prompt_detection() -> None:
+    async def scenario() -> list[str]:
+        watcher = PaneWatcher("$1")
+        stdout = _connect(watcher)
+        watcher._subscribed.add("%1")
+        watcher._buffer("%1").command = "bash"
+        events = []
+        for update in [b"make 0", b"bash 0", b"python 0", b"python 1"]:
+            waiter = asyncio.create_task(watcher.wait("%1", Trigger(on_exit=True), 0.2))
+            await asyncio.sleep(0)
+            stdout.feed_data(
+                b"%subscription-changed hi1 $1 @1 1 %1 : " + update + b"\n"
+            )
+            events.append((await waiter).trigger)
+        stdout.feed_eof()
+        assert watcher._reader
+        await watcher._reader
+        return events
+
+    # A command starting does not fire, returning to the prompt or dying does
+    assert asyncio.run(scenario()) == ["timeout", "exit", "timeout", "exit"]
+
+
+def test_pattern_and_closed_connection() -> None:
+    async def scenario() -> list[str]:
+        watcher = PaneWatcher("$1")
+        stdout = _connect(watcher)
+        trigger = Trigger(pattern=re.compile(r"ready on (\d+)"), on_exit=True)
+        watcher._subscribed.add("%2")
+        waiter = asyncio.create_task(watcher.wait("%2", trigger, 5))
+        await asyncio.sleep(0)
+        stdout.feed_data(b"%output %2 starting\\015\\012ready on 8000\\015\\012\n")
+        event = await waiter
+        waiter = asyncio.create_task(watcher.wait("%2", trigger, 5))
+        await asyncio.sleep(0)
+        stdout.feed_eof()
+        return [event.trigger, event.line, (await waiter).trigger]
+
+    assert asyncio.run(scenario()) == ["pattern", "ready on 8000", "exit"]
+
+
+def test_wait_idle_and_timeout() -> None:
+    async def scenario() -> tuple[str, str, float]:
+        watcher = PaneWatcher("$1")
+        watcher._on_output("%1", "busy\n")
+        loop = asyncio.get_running_loop()
+
+        async def keep_busy() -> None:
+            for _ in range(4):
+                await asyncio.sleep(0.05)
+                watcher._on_output("%1", "busy\n")
+
+        busy = asyncio.create_task(keep_busy())
+        start = loop.time()
+        idle = await watcher.wait("%1", Trigger(idle_seconds=0.1), 2)
+        idle_after = loop.time() - start
+        await busy
+        timeout = await watcher.wait("%1", Trigger(idle_seconds=10), 0.1)
+        assert not watcher.buffers["%1"].waiters
+        return idle.trigger, timeout.trigger, idle_after
+
+    idle, timeout, idle_after = asyncio.run(scenario())
+    assert (idle, timeout) == ("idle", "timeout")
+    # Output kept the pane busy for 0.2 s, then it was idle for 0.1 s
+    assert 0.25 < idle_after < 1